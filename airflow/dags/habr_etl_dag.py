@@ -11,6 +11,8 @@ sys.path.append('/opt/airflow/src')
 from collector import HabrDataCollector
 from db_manager import DatabaseManager
 from elasticsearch_manager import ElasticsearchManager
+from redis_manager import RedisManager
+from tfidf_store import vectorize_articles
 
 default_args = {
     'owner': 'habr-search',
@@ -22,6 +24,25 @@ default_args = {
     'retry_delay': timedelta(minutes=5),
 }
 
+def apply_migrations(**context):
+    print("Применяем миграции базы данных")
+    
+    db_manager = DatabaseManager()
+    
+    if not db_manager.test_connection():
+        raise Exception("Не удалось подключиться к базе данных")
+    
+    applied = db_manager.apply_migrations()
+    
+    print(f"Применено миграций: {len(applied)}")
+    for migration in applied:
+        print(f"   {migration}")
+    
+    backfilled = db_manager.backfill_static_features()
+    print(f"Статические признаки заполнены для {backfilled} статей")
+    
+    return len(applied)
+
 def collect_articles(**context):
     print("Запускаем сбор статей с Habr")
     
@@ -56,6 +77,7 @@ def save_to_database(**context):
     
     saved_count = db_manager.save_articles_to_db(articles)
     total_count = db_manager.get_articles_count()
+    db_manager.refresh_hub_stats()
     
     print(f"Сохранено {saved_count} новых статей")
     print(f"Всего статей в базе: {total_count}")
@@ -65,6 +87,19 @@ def save_to_database(**context):
     
     return saved_count
 
+def vectorize_new_articles(**context):
+    print("Векторизуем статьи для TF-IDF матрицы")
+    
+    articles = context['task_instance'].xcom_pull(key='articles', task_ids='collect_articles')
+    if not articles:
+        raise Exception("Нет статей для векторизации")
+    
+    vectorized_count = vectorize_articles(articles, '/opt/airflow/data')
+    
+    print(f"Векторизовано {vectorized_count} статей")
+    
+    return vectorized_count
+
 def index_elasticsearch(**context):
     print("Индексируем статьи в Elasticsearch")
     
@@ -85,6 +120,18 @@ def index_elasticsearch(**context):
     
     return indexed_count
 
+def bump_cache_generation(**context):
+    print("Инвалидируем кэш поиска")
+    
+    # индекс, метаданные и TF-IDF обновлены: новое поколение делает старые ключи недостижимыми без сканирования
+    redis_manager = RedisManager()
+    generation = redis_manager.bump_cache_generation()
+    removed = redis_manager.purge_stale_generations()
+    
+    print(f"Поколение кэша: {generation}, удалено устаревших ключей: {removed}")
+    
+    return generation
+
 def check_data_quality(**context):
     print("Проверяем качество данных")
     
@@ -146,6 +193,12 @@ check_services = BashOperator(
     dag=dag,
 )
 
+migrate_task = PythonOperator(
+    task_id='apply_migrations',
+    python_callable=apply_migrations,
+    dag=dag,
+)
+
 collect_task = PythonOperator(
     task_id='collect_articles',
     python_callable=collect_articles,
@@ -158,16 +211,28 @@ save_task = PythonOperator(
     dag=dag,
 )
 
+vectorize_task = PythonOperator(
+    task_id='vectorize_articles',
+    python_callable=vectorize_new_articles,
+    dag=dag,
+)
+
 index_task = PythonOperator(
     task_id='index_elasticsearch',
     python_callable=index_elasticsearch,
     dag=dag,
 )
 
+cache_generation_task = PythonOperator(
+    task_id='bump_cache_generation',
+    python_callable=bump_cache_generation,
+    dag=dag,
+)
+
 quality_check_task = PythonOperator(
     task_id='check_data_quality',
     python_callable=check_data_quality,
     dag=dag,
 )
 
-check_services >> collect_task >> [save_task, index_task] >> quality_check_task
+check_services >> migrate_task >> collect_task >> [save_task, index_task, vectorize_task] >> cache_generation_task >> quality_check_task
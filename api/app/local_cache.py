@@ -0,0 +1,138 @@
+import json
+import time
+import threading
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from prometheus_client import Counter as PrometheusCounter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = PrometheusCounter(
+    'search_cache_requests_total', 'Обращения к кэшу поиска по уровням',
+    ['cache', 'tier', 'result']
+)
+CACHE_EVICTIONS = PrometheusCounter(
+    'search_cache_evictions_total', 'Вытеснения из локального кэша поиска',
+    ['cache', 'reason']
+)
+CACHE_BYTES = Gauge('search_cache_local_bytes', 'Размер локального кэша поиска в байтах', ['cache'])
+CACHE_ENTRIES = Gauge('search_cache_local_entries', 'Количество записей локального кэша поиска', ['cache'])
+
+
+def record_lookup(cache: str, tier: str, hits: int, misses: int):
+
+    if hits:
+        CACHE_REQUESTS.labels(cache, tier, 'hit').inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, tier, 'miss').inc(misses)
+
+
+def estimate_size(value: Any) -> int:
+    # размер JSON представления: столько же значение занимает в Redis, для ограничения памяти этого достаточно
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+class LocalCache:
+
+    def __init__(self, name: str, max_bytes: int, ttl: float):
+
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self.current_bytes = 0
+        self.counters = Counter()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+    
+    def _remove(self, key: Hashable, reason: str):
+
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+        self.counters[f'evictions_{reason}'] += 1
+        CACHE_EVICTIONS.labels(self.name, reason).inc()
+    
+    def _update_gauges(self):
+
+        CACHE_BYTES.labels(self.name).set(self.current_bytes)
+        CACHE_ENTRIES.labels(self.name).set(len(self._entries))
+    
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+
+        if not self.enabled:
+            return {}
+        
+        found = {}
+        misses = 0
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] <= now:
+                    self._remove(key, 'expired')
+                    entry = None
+                if entry is None:
+                    misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+            
+            self.counters['hits'] += len(found)
+            self.counters['misses'] += misses
+            self._update_gauges()
+        
+        record_lookup(self.name, 'local', len(found), misses)
+        return found
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+    
+    def set_many(self, items: Dict[Hashable, Any]):
+
+        if not self.enabled or not items:
+            return
+        
+        sized = [(key, value, estimate_size(value)) for key, value in items.items()]
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value, size in sized:
+                if size > self.max_bytes:
+                    continue
+                if key in self._entries:
+                    _, old_size, _ = self._entries.pop(key)
+                    self.current_bytes -= old_size
+                self._entries[key] = (value, size, expires_at)
+                self.current_bytes += size
+            
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), 'size')
+            self._update_gauges()
+    
+    def set(self, key: Hashable, value: Any):
+        self.set_many({key: value})
+    
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None):
+
+        with self._lock:
+            targets = list(self._entries) if keys is None else [key for key in keys if key in self._entries]
+            for key in targets:
+                self._remove(key, 'invalidated')
+            self._update_gauges()
+        
+        if targets:
+            logger.debug(f"Локальный кэш {self.name}: инвалидировано {len(targets)} записей")
+    
+    def get_stats(self) -> Dict[str, Any]:
+
+        with self._lock:
+            return {
+                **self.counters,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -5,11 +5,15 @@ import os
 import uvicorn
 
 from routers import search
+from app.search_engine import close_async_search_engine
+from app.responses import FastJSONResponse
+from db_manager import close_connection_pools
 
 app = FastAPI(
     title="Habr Searcher",
     description="API для двухэтапной системы поиска статей с Habr.com",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 app.add_middleware(
@@ -25,6 +29,11 @@ app.include_router(search.router)
 instrumentator = Instrumentator()
 instrumentator.instrument(app).expose(app)
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_async_search_engine()
+    close_connection_pools()
+
 @app.get("/")
 async def root():
     return {
@@ -1,26 +1,37 @@
 import os
 import sys
 import json
+import time
 import pickle
 import joblib
+import hashlib
 import logging
 from typing import Dict, List, Any, Tuple, Optional
 from datetime import datetime, timezone
 import numpy as np
 import pandas as pd
-import re
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 
+from tfidf_store import TfidfDocumentStore, document_text
+from ranking_features import FeatureSchemaError, build_feature_matrix, validate_feature_schema
+from app.search_metrics import record_ml_fallback, stage_timer
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _fallback_order(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    for candidate in candidates:
+        candidate['ml_score'] = candidate.get('bm25_score', 0.0)
+    return candidates
+
+
 class MLRanker:    
     def __init__(self, model_path: str = None, feature_info_path: str = None, 
-                 tfidf_path: str = None):
+                 tfidf_path: str = None, tfidf_documents_path: str = None):
         
         data_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
         
@@ -30,16 +41,25 @@ class MLRanker:
             feature_info_path = os.path.join(data_dir, 'lgbm_ranker_final_info.json')
         if tfidf_path is None:
             tfidf_path = os.path.join(data_dir, 'tfidf_vectorizer.pkl')
+        if tfidf_documents_path is None:
+            tfidf_documents_path = os.path.join(data_dir, 'tfidf_documents')
         
         self.model = None
+        self.model_version = None
         self.feature_columns = None
+        self.feature_schema = None
         self.tfidf_vectorizer = None
         self.tfidf_document_index = None
+        self.tfidf_documents = None
+        self.tfidf_documents_path = tfidf_documents_path
+        self._tfidf_documents_mtime = None
+        self._tfidf_documents_checked_at = 0.0
         
         try:
-            import joblib
             self.model = joblib.load(model_path)
-            logger.info(f"LightGBM модель загружена из {model_path}")
+            with open(model_path, 'rb') as f:
+                self.model_version = hashlib.md5(f.read()).hexdigest()[:12]
+            logger.info(f"LightGBM модель загружена из {model_path}, версия {self.model_version}")
         except FileNotFoundError:
             logger.warning(f"Модель не найдена: {model_path}")
             self.model = None
@@ -50,19 +70,19 @@ class MLRanker:
         try:
             with open(feature_info_path, 'r', encoding='utf-8') as f:
                 feature_info = json.load(f)
-                self.feature_columns = feature_info.get('feature_columns', [])
             logger.info(f"Информация о признаках загружена из {feature_info_path}")
+            
+            n_model_features = self.model.num_feature() if hasattr(self.model, 'num_feature') else None
+            self.feature_schema = feature_info.get('feature_schema')
+            self.feature_columns = validate_feature_schema(self.feature_schema, n_model_features)
         except FileNotFoundError:
             logger.warning(f"Информация о признаках не найдена: {feature_info_path}")
-            self.feature_columns = [
-                'freshness', 'author_rating', 'views', 'comments_count',
-                'article_word_count', 'has_code', 'has_images', 'title_length',
-                'tags_count', 'tfidf_similarity', 'query_in_title', 
-                'query_in_tags', 'text_overlap_ratio', 'query_length'
-            ]
+            self._reject_model("схема признаков не найдена")
+        except FeatureSchemaError as e:
+            self._reject_model(str(e))
         except Exception as e:
             logger.error(f"Ошибка загрузки информации о признаках: {e}")
-            self.feature_columns = []
+            self._reject_model(str(e))
         
         try:
             with open(tfidf_path, 'rb') as f:
@@ -76,242 +96,132 @@ class MLRanker:
         except Exception as e:
             logger.error(f"Ошибка загрузки TF-IDF векторизатора: {e}")
             self.tfidf_vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 2))
+        
+        self._load_document_store()
+    
+    def _reject_model(self, reason: str):
+
+        if self.model is not None:
+            logger.error(f"Модель отклонена, поиск будет работать без ML ранжирования: {reason}")
+        self.model = None
+        self.model_version = None
+        self.feature_columns = []
+    
+    def _load_document_store(self):
+
+        meta_path = os.path.join(self.tfidf_documents_path, 'meta.json')
+        try:
+            mtime = os.path.getmtime(meta_path)
+            if mtime != self._tfidf_documents_mtime:
+                self.tfidf_documents = TfidfDocumentStore.load(self.tfidf_documents_path, mmap=True)
+                self._tfidf_documents_mtime = mtime
+                logger.info(f"TF-IDF матрица документов загружена из {self.tfidf_documents_path}: "
+                            f"{len(self.tfidf_documents)} документов")
+        except FileNotFoundError:
+            if self.tfidf_documents is None:
+                logger.warning(f"TF-IDF матрица документов не найдена: {self.tfidf_documents_path}")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки TF-IDF матрицы документов: {e}")
+    
+    def _refresh_document_store(self, interval: float = 60.0):
+
+        now = time.monotonic()
+        if now - self._tfidf_documents_checked_at >= interval:
+            self._tfidf_documents_checked_at = now
+            self._load_document_store()
     
     def is_ready(self) -> bool:
         return self.model is not None and bool(self.feature_columns)
     
-    def generate_document_features(self, doc: Dict[str, Any]) -> Dict[str, float]:
-        
-        def calculate_word_count(text):
-            if not text:
-                return 0
-            words = re.findall(r'\w+', str(text).lower())
-            return len(words)
-        
-        def has_code_blocks(text):
-            if not text:
-                return 0
-            text_str = str(text)
-            code_patterns = [
-                r'<code>.*?</code>', r'```.*?```', r'`.*?`', r'<pre>.*?</pre>',
-                r'\{.*?\}', r'function\s+\w+', r'class\s+\w+', r'def\s+\w+',
-                r'import\s+\w+', r'from\s+\w+'
-            ]
-            for pattern in code_patterns:
-                if re.search(pattern, text_str, re.DOTALL | re.IGNORECASE):
-                    return 1
-            return 0
-        
-        def has_images(text):
-            if not text:
-                return 0
-            text_str = str(text)
-            image_patterns = [
-                r'<img.*?>', r'!\[.*?\]\(.*?\)', r'<figure.*?>.*?</figure>',
-                r'\.jpg|\.jpeg|\.png|\.gif|\.svg'
-            ]
-            for pattern in image_patterns:
-                if re.search(pattern, text_str, re.IGNORECASE):
-                    return 1
-            return 0
-        
-        views = doc.get('views', 0) or 0
-        text_content = doc.get('text_content', '') or ''
-        title = doc.get('title', '') or ''
-        tags = doc.get('tags', []) or []
-        
-        query_words = set(query.lower().split())
-        title_words = set(title.lower().split())
-        tag_words = set(' '.join(tags).lower().split())
-        
-        common_words_count = len(query_words.intersection(title_words))
-        tag_overlap_count = len(query_words.intersection(tag_words))
-        
-        features = {
-            'views': views,
-            'comments_count': doc.get('comments_count', 0) or 0,
-            'score': doc.get('score', 0) or 0,
-            'text_length': calculate_word_count(text_content),
-            'query_in_title': 1 if query.lower() in title.lower() else 0,
-            'common_words': common_words_count,
-            'tag_overlap': tag_overlap_count,
-            'bm25_score': doc.get('bm25_score', 0) or 0
-        }
-        
-        return features
-    
-    def generate_query_document_features(self, query: str, doc: Dict[str, Any], 
-                                       bm25_score: float = 0.0) -> Dict[str, float]:
-        
-        def preprocess_text(text):
-            if not text:
-                return set()
-            text = str(text).lower()
-            text = re.sub(r'[^\w\s]', ' ', text)
-            words = text.split()
-            return set(word for word in words if len(word) > 2)
+    def calculate_tfidf_similarity(self, query: str, candidates: List[Dict[str, Any]]) -> np.ndarray:
+
+        similarity = np.zeros(len(candidates), dtype=np.float64)
+        with_text = [i for i, candidate in enumerate(candidates) if candidate.get('text_content')]
+        if not self.tfidf_vectorizer or not with_text:
+            return similarity
         
-        def calculate_tfidf_similarity(query_text, doc_text):
+        try:
+            query_vec = self.tfidf_vectorizer.transform([query])
             
-            if not self.tfidf_vectorizer:
-                return 0.0
+            self._refresh_document_store()
+            if self.tfidf_documents is not None:
+                stored_similarity, found = self.tfidf_documents.similarities(
+                    query_vec, [candidates[i].get('id') for i in with_text]
+                )
+                stored = [i for i, is_found in zip(with_text, found) if is_found]
+                similarity[stored] = stored_similarity[found]
+                with_text = [i for i, is_found in zip(with_text, found) if not is_found]
             
-            try:
-                texts = [str(query_text), str(doc_text)]
-                
-                if not hasattr(self.tfidf_vectorizer, 'vocabulary_') or \
-                   self.tfidf_vectorizer.vocabulary_ is None:
-                    tfidf_matrix = self.tfidf_vectorizer.fit_transform(texts)
-                else:
-                    tfidf_matrix = self.tfidf_vectorizer.transform(texts)
-                
-                query_vec = tfidf_matrix[0:1]
-                doc_vec = tfidf_matrix[1:2]
-                similarity = cosine_similarity(query_vec, doc_vec)[0, 0]
-                
-                return float(similarity)
-            except:
-                return 0.0
-        
-        query_lower = str(query).lower().strip()
-        title = str(doc.get('title', ''))
-        text_content = str(doc.get('text_content', ''))[:1000]  
-        tags = doc.get('tags', []) or []
-        
-        query_words = preprocess_text(query)
-        title_words = preprocess_text(title)
-        text_words = preprocess_text(text_content)
-        
-        doc_text = f"{title} {text_content}"
-        tfidf_similarity = calculate_tfidf_similarity(query, doc_text)
-        
-        query_in_title = 1 if len(query_words.intersection(title_words)) > 0 else 0
-        
-        query_in_tags = 0
-        for tag in tags:
-            if query_lower == str(tag).lower().strip():
-                query_in_tags = 1
-                break
-        
-        text_overlap_ratio = 0.0
-        if query_words and text_words:
-            intersection = query_words.intersection(text_words)
-            text_overlap_ratio = len(intersection) / len(query_words)
-        
-        features = {
-            'tfidf_similarity': tfidf_similarity,
-            'query_in_title': query_in_title,
-            'query_in_tags': query_in_tags,
-            'text_overlap_ratio': text_overlap_ratio,
-            'query_length': len(str(query).split())
-        }
+            if with_text:
+                doc_matrix = self.tfidf_vectorizer.transform([
+                    document_text(candidates[i].get('title'), candidates[i].get('text_content')) for i in with_text
+                ])
+                similarity[with_text] = (doc_matrix @ query_vec.T).toarray().ravel()
+        except Exception as e:
+            logger.debug(f"Ошибка вычисления TF-IDF: {e}")
         
-        return features
+        return similarity
     
-    def generate_features_for_candidate(self, query: str, doc: Dict[str, Any], 
-                                      bm25_score: float = 0.0) -> List[float]:
-        
-        views = doc.get('views', 0) or 0
-        comments_count = doc.get('comments_count', 0) or 0
-        score = doc.get('score', 0) or 0
-        text_content = doc.get('text_content', '') or ''
-        title = doc.get('title', '') or ''
-        tags = doc.get('tags', []) or []
-        
-        text_length = len(text_content.split()) if text_content else 0
-        
-        tfidf_similarity = 0.0
-        if self.tfidf_vectorizer and text_content:
-            try:
-                query_vec = self.tfidf_vectorizer.transform([query])
-                doc_vec = self.tfidf_vectorizer.transform([f"{title} {text_content}"])
-                similarity = (query_vec * doc_vec.T).toarray()[0][0]
-                tfidf_similarity = float(similarity)
-            except Exception as e:
-                logger.debug(f"Ошибка вычисления TF-IDF: {e}")
-        
-        query_in_title = 1 if query.lower() in title.lower() else 0
-        
-        query_words = set(query.lower().split())
-        title_words = set(title.lower().split())
-        common_words = len(query_words.intersection(title_words))
-        
-        tag_words = set(' '.join(tags).lower().split()) if tags else set()
-        tag_overlap = len(query_words.intersection(tag_words))
-        
-        feature_vector = [
-            float(views),
-            float(comments_count), 
-            float(score),
-            float(text_length),
-            float(tfidf_similarity),
-            float(query_in_title),
-            float(common_words),
-            float(tag_overlap),
-            float(bm25_score)
-        ]
-        
-        return feature_vector
+    def generate_features_batch(self, query: str, candidates: List[Dict[str, Any]]) -> np.ndarray:
+
+        return build_feature_matrix(query, candidates, self.calculate_tfidf_similarity(query, candidates))
+    
+    def generate_features_for_candidate(self, query: str, doc: Dict[str, Any]) -> List[float]:
+
+        return self.generate_features_batch(query, [doc])[0].tolist()
     
     def rank_candidates(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.rank_candidates_many([(query, candidates)])[0]
+    
+    def rank_candidates_many(self, groups: List[Tuple[str, List[Dict[str, Any]]]]) -> List[List[Dict[str, Any]]]:
 
         if not self.is_ready():
             logger.warning("ML модель не готова, возвращаем исходный порядок")
-            for candidate in candidates:
-                candidate['ml_score'] = candidate.get('bm25_score', 0.0)
-            return candidates
+            record_ml_fallback('model_not_ready', len(groups))
+            return [_fallback_order(candidates) for _, candidates in groups]
         
-        if not candidates:
-            return []
+        documents = [candidate for _, candidates in groups for candidate in candidates]
+        if not documents:
+            return [[] for _ in groups]
         
         try:
-            features_matrix = []
-            valid_candidates = []
-            
-            for candidate in candidates:
-                try:
-                    features = self.generate_features_for_candidate(
-                        query, 
-                        candidate, 
-                        candidate.get('bm25_score', 0.0)
-                    )
-                    
-                    if features and len(features) == len(self.feature_columns):
-                        features_matrix.append(features)
-                        valid_candidates.append(candidate)
-                except Exception as e:
-                    logger.warning(f"Ошибка генерации признаков для кандидата {candidate.get('id', 'unknown')}: {e}")
-                    continue
-            
-            if not features_matrix:
-                logger.warning("Не удалось сгенерировать признаки ни для одного кандидата")
-                for candidate in candidates:
-                    candidate['ml_score'] = candidate.get('bm25_score', 0.0)
-                return candidates
-            
-            features_array = np.array(features_matrix)
-            ml_scores = self.model.predict(features_array, num_iteration=self.model.best_iteration)
-            
-            for i, candidate in enumerate(valid_candidates):
-                candidate['ml_score'] = float(ml_scores[i])
+            # признаки всех запросов собираются в одну матрицу, модель проходит по ней один раз
+            with stage_timer('features'):
+                features_array = build_feature_matrix(
+                    [query for query, candidates in groups for _ in candidates],
+                    documents,
+                    np.concatenate([self.calculate_tfidf_similarity(query, candidates) for query, candidates in groups])
+                )
+            with stage_timer('predict'):
+                ml_scores = self.model.predict(features_array, num_iteration=self.model.best_iteration)
             
-            valid_candidates.sort(key=lambda x: x['ml_score'], reverse=True)
+            ranked_groups = []
+            start = 0
+            for _, candidates in groups:
+                valid_candidates = list(candidates)
+                for candidate, ml_score in zip(valid_candidates, ml_scores[start:start + len(valid_candidates)]):
+                    candidate['ml_score'] = float(ml_score)
+                start += len(valid_candidates)
+                valid_candidates.sort(key=lambda x: x['ml_score'], reverse=True)
+                ranked_groups.append(valid_candidates)
             
-            logger.info(f"Успешно ранжированы {len(valid_candidates)} кандидатов")
-            return valid_candidates
+            logger.info(f"Успешно ранжированы {len(documents)} кандидатов для {len(groups)} запросов")
+            return ranked_groups
             
         except Exception as e:
             logger.error(f"Ошибка при ранжировании кандидатов: {e}")
-            for candidate in candidates:
-                candidate['ml_score'] = candidate.get('bm25_score', 0.0)
-            return candidates
+            record_ml_fallback('ranking_error', len(groups))
+            return [_fallback_order(candidates) for _, candidates in groups]
     
     def get_model_info(self) -> Dict[str, Any]:
 
         return {
             'model_loaded': self.model is not None,
+            'model_version': self.model_version,
             'features_count': len(self.feature_columns) if self.feature_columns else 0,
             'feature_columns': self.feature_columns,
+            'feature_schema_version': self.feature_schema.get('version') if self.feature_schema else None,
             'tfidf_loaded': self.tfidf_vectorizer is not None,
+            'tfidf_documents': len(self.tfidf_documents) if self.tfidf_documents is not None else 0,
             'ready': self.is_ready()
         }
@@ -1,10 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
 class SearchRequest(BaseModel):
     query: str
-    top_n: int = 10
+    top_n: int = Field(10, ge=1, le=100)
+    offset: int = Field(0, ge=0)
+    cursor: Optional[str] = None
     compare: bool = False
 
 class SearchResult(BaseModel):
@@ -18,11 +20,47 @@ class SearchResult(BaseModel):
     comments_count: int
     tags: List[str]
 
+class CompareRequest(BaseModel):
+    query: str
+    top_n: int = Field(10, ge=1, le=100)
+
+class CompareResult(SearchResult):
+    ml_rank: int
+    bm25_rank: int
+    rank_delta: int
+
+class CompareResponse(BaseModel):
+    query: str
+    mode: str
+    ml: List[CompareResult]
+    bm25: List[CompareResult]
+    overlap: int
+    search_time: float
+
 class SearchResponse(BaseModel):
     query: str
     results: List[SearchResult]
     total_results: int
     search_time: float
+    offset: int = 0
+    next_cursor: Optional[str] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=100)
+    top_n: int = Field(10, ge=1, le=100)
+    compare: bool = False
+
+class BatchSearchItem(BaseModel):
+    query: str
+    results: List[SearchResult]
+    total_results: int
+    search_time: float
+    cached: bool
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchItem]
+    total_queries: int
+    search_time: float
 
 class DatabaseStats(BaseModel):
     total_articles: int
@@ -30,6 +68,19 @@ class DatabaseStats(BaseModel):
     avg_views: float
     top_hubs: List[dict]
 
+class ArticleSummary(BaseModel):
+    id: int
+    url: str
+    title: str
+    tags: List[str]
+    views: int
+    score: int
+    comments_count: int
+
+class ArticlePage(BaseModel):
+    articles: List[ArticleSummary]
+    next_cursor: Optional[str] = None
+
 class SearchHistory(BaseModel):
     query: str
     timestamp: datetime
@@ -0,0 +1,37 @@
+import os
+import sys
+import logging
+from typing import Any, Dict
+
+from fastapi.responses import Response
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from cache_codec import JSON_ENCODER, json_dumps
+
+logger = logging.getLogger(__name__)
+
+if JSON_ENCODER != 'orjson':
+    logger.warning("orjson не установлен, ответы API кодируются стандартным json")
+
+
+def merge_json_object(fields: Dict[str, Any], body: bytes) -> bytes:
+
+    # дописывает поля к уже закодированному JSON объекту, не декодируя его
+    head = json_dumps(fields)
+    if body.strip() == b'{}':
+        return head
+    if not fields:
+        return body
+    return head[:-1] + b',' + body.lstrip()[1:]
+
+
+class FastJSONResponse(Response):
+    media_type = 'application/json'
+    
+    def render(self, content: Any) -> bytes:
+
+        # bytes - тело из кэша страниц, его не перекодируем
+        if isinstance(content, bytes):
+            return content
+        return json_dumps(content)
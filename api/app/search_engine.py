@@ -1,195 +1,816 @@
 import os
 import sys
+import json
 import time
+import base64
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any
+from collections import Counter
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src'))
 
-from elasticsearch_manager import ElasticsearchManager
-from redis_manager import RedisManager
-from db_manager import DatabaseManager
+from elasticsearch_manager import AsyncElasticsearchManager, TEXT_PREFIX_LENGTH
+from redis_manager import RedisManager, AsyncRedisManager, ARTICLE_DISPLAY_FIELDS, ARTICLE_RANKING_FIELDS
+from document_features import STATIC_FEATURE_COLUMNS
+from db_manager import AsyncDatabaseManager, CursorError
+from query_normalizer import normalize_query
+from cache_codec import json_dumps
 from app.ml_ranker import MLRanker
+from app.single_flight import AsyncSingleFlight
+from app.local_cache import LocalCache, record_lookup
+from app.search_metrics import record_candidates, record_ml_fallback, stage_timer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-_search_engine = None
+ML_CANDIDATES_COUNT = 100
+RANKED_LIST_DEPTH = 100
 
-class SearchEngine:
+SEARCH_DISTRIBUTED_LOCK = os.getenv('SEARCH_DISTRIBUTED_LOCK', 'false').lower() in ('1', 'true', 'yes')
+SEARCH_LOCK_TTL = int(os.getenv('SEARCH_LOCK_TTL', '30'))
+SEARCH_LOCK_WAIT = float(os.getenv('SEARCH_LOCK_WAIT', '5'))
+SEARCH_LOCK_POLL_INTERVAL = 0.05
+
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', '300'))
+
+# готовые JSON тела страниц в Redis: попадание отдается в ответ без декодирования и сборки моделей
+SEARCH_RESPONSE_CACHE = os.getenv('SEARCH_RESPONSE_CACHE', 'false').lower() in ('1', 'true', 'yes')
+SEARCH_RESPONSE_CACHE_TTL = int(os.getenv('SEARCH_RESPONSE_CACHE_TTL', '600'))
+
+LOCAL_CACHE_TTL = float(os.getenv('LOCAL_CACHE_TTL', '30'))
+LOCAL_CACHE_RANKED_MAX_BYTES = int(os.getenv('LOCAL_CACHE_RANKED_MAX_BYTES', str(32 * 1024 * 1024)))
+LOCAL_CACHE_METADATA_MAX_BYTES = int(os.getenv('LOCAL_CACHE_METADATA_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# ранжированный список (id и скоры) и метаданные статей, если список посчитан в этом запросе
+RankedResult = Tuple[Dict[str, Any], Optional[Dict[int, Dict[str, Any]]]]
+
+_async_search_engine = None
+_ml_ranker = None
+_local_caches = None
+
+
+def get_ml_ranker() -> MLRanker:
+
+    global _ml_ranker
+    if _ml_ranker is None:
+        _ml_ranker = MLRanker()
+    return _ml_ranker
+
+
+def _on_cache_invalidation(message: Dict[str, Any]):
+
+    caches = get_local_caches()
+    names = [message['cache']] if message.get('cache') else list(caches)
+    for name in names:
+        if name in caches:
+            caches[name].invalidate(message.get('keys'))
+
+
+def get_local_caches() -> Dict[str, LocalCache]:
+
+    global _local_caches
+    if _local_caches is None:
+        # общие для синхронного и асинхронного движка в процессе, другие воркеры сбрасывают их через pub/sub
+        _local_caches = {
+            'ranked': LocalCache('ranked', LOCAL_CACHE_RANKED_MAX_BYTES, LOCAL_CACHE_TTL),
+            'metadata': LocalCache('metadata', LOCAL_CACHE_METADATA_MAX_BYTES, LOCAL_CACHE_TTL)
+        }
+        if any(cache.enabled for cache in _local_caches.values()):
+            RedisManager().subscribe_invalidation(_on_cache_invalidation)
+    return _local_caches
+
+
+def _ranking_mode(ml_ranker: MLRanker, use_ml: bool) -> Tuple[str, str, int]:
+
+    if use_ml and not ml_ranker.is_ready():
+        logger.warning("ML модель не готова, используем BM25 поиск")
+        record_ml_fallback('model_not_ready')
+        use_ml = False
+    if use_ml:
+        return 'ml', ml_ranker.model_version, ML_CANDIDATES_COUNT
+    return 'bm25', 'bm25', RANKED_LIST_DEPTH
+
+
+def _ranked_cache_key(mode: str, version: str, query: str) -> str:
+    return f"{mode}:{version}:{query}"
+
+
+def _flight_key(mode: str, version: str, query: str, depth: int) -> str:
+    return f"{mode}:{version}:{depth}:{query}"
+
+
+def _result_metadata(article_data: Dict[str, Any]) -> Dict[str, Any]:
+
+    return {
+        'title': article_data['title'],
+        'url': article_data['url'],
+        'views': article_data.get('views', 0),
+        'comments_count': article_data.get('comments_count', 0),
+        'tags': article_data.get('tags', [])
+    }
+
+
+def _ranking_fields(article_data: Dict[str, Any]) -> Dict[str, Any]:
+
+    # в кэш попадает только префикс текста, как и в _source Elasticsearch
+    return {
+        **_result_metadata(article_data),
+        'text_prefix': (article_data.get('text_content') or '')[:TEXT_PREFIX_LENGTH],
+        'score': article_data.get('score', 0),
+        **{column: article_data.get(column) for column in STATIC_FEATURE_COLUMNS}
+    }
+
+
+def _ranked_list(ids: List[int], scores: List[float], bm25_scores: Optional[List[float]],
+                 complete: bool, search_after: Optional[List[Any]] = None,
+                 window: Optional[int] = None) -> Dict[str, Any]:
     
-    def __init__(self):
+    ranked = {'ids': ids, 'scores': scores, 'complete': complete}
+    if bm25_scores is not None:
+        ranked['bm25_scores'] = bm25_scores
+    # ключ сортировки последнего кандидата BM25 окна: с него Elasticsearch продолжает выдачу за окном;
+    # window - сколько хитов Elasticsearch покрывает окно (при обогащении часть кандидатов отбрасывается)
+    if search_after is not None:
+        ranked['search_after'] = search_after
+        ranked['window'] = window if window is not None else len(ids)
+    return ranked
 
-        self.db_manager = DatabaseManager()
-        self.es_manager = ElasticsearchManager()
-        self.redis_manager = RedisManager()
-        
-        self.ml_ranker = MLRanker()
+
+def _es_window(ranked: Dict[str, Any]) -> int:
+    # списки, закэшированные до появления window, не теряли кандидатов
+    return ranked.get('window', len(ranked['ids']))
+
+
+def _covers(ranked: Optional[Dict[str, Any]], depth: int) -> bool:
+    return ranked is not None and (ranked['complete'] or len(ranked['ids']) >= depth)
+
+
+def _format_result(doc_id: int, score: float, bm25_score: float, metadata: Dict[str, Any]) -> Dict[str, Any]:
+
+    return {
+        'id': doc_id,
+        'title': metadata['title'],
+        'url': metadata['url'],
+        'score': score,
+        'ml_score': score,
+        'bm25_score': bm25_score,
+        'views': metadata.get('views', 0),
+        'comments_count': metadata.get('comments_count', 0),
+        'tags': metadata.get('tags', [])
+    }
+
+
+def _bm25_ranked_list(candidates: List[Dict[str, Any]], depth: int) -> RankedResult:
+
+    complete = len(candidates) < depth
+    ranked = _ranked_list(
+        [candidate['doc_id'] for candidate in candidates],
+        [candidate['bm25_score'] for candidate in candidates],
+        None,
+        complete=complete,
+        search_after=None if complete else candidates[-1]['sort'],
+        window=len(candidates)
+    )
+    return ranked, {candidate['doc_id']: _result_metadata(candidate) for candidate in candidates}
+
+
+def _ml_window_search_after(candidates: List[Dict[str, Any]]) -> Optional[List[Any]]:
+    return candidates[-1]['sort'] if len(candidates) == ML_CANDIDATES_COUNT else None
+
+
+def _ml_ranked_list(candidates: List[Dict[str, Any]], window: List[Dict[str, Any]]) -> RankedResult:
+
+    # ML переранжирует только первые ML_CANDIDATES_COUNT кандидатов BM25, дальше выдача идет в порядке BM25;
+    # window - хиты Elasticsearch до обогащения, candidates - обогащенные и ранжированные из них
+    ranked = _ranked_list(
+        [candidate['id'] for candidate in candidates],
+        [candidate['ml_score'] for candidate in candidates],
+        [candidate['bm25_score'] for candidate in candidates],
+        complete=True,
+        search_after=_ml_window_search_after(window),
+        window=len(window)
+    )
+    return ranked, {candidate['id']: _result_metadata(candidate) for candidate in candidates}
+
+
+def _format_page(ranked: Dict[str, Any], metadata: Dict[int, Dict[str, Any]],
+                 offset: int, top_n: int) -> List[Dict[str, Any]]:
+    
+    page = slice(offset, offset + top_n)
+    ids, scores = ranked['ids'][page], ranked['scores'][page]
+    bm25_scores = ranked.get('bm25_scores', ranked['scores'])[page]
+    return [
+        _format_result(doc_id, score, bm25_score, metadata[doc_id])
+        for doc_id, score, bm25_score in zip(ids, scores, bm25_scores)
+        if doc_id in metadata
+    ]
+
+
+def _query_digest(query: str) -> str:
+    return hashlib.md5(query.encode('utf-8')).hexdigest()[:8]
+
+
+def encode_search_cursor(query: str, offset: int, search_after: Optional[List[Any]] = None) -> str:
+
+    payload = {'q': _query_digest(query), 'o': offset}
+    if search_after is not None:
+        payload['a'] = search_after
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_search_cursor(cursor: str, query: str) -> Tuple[int, Optional[List[Any]]]:
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        offset, search_after = int(payload['o']), payload.get('a')
+    except (ValueError, TypeError, KeyError) as e:
+        raise CursorError(f"Некорректный курсор: {cursor}") from e
+    
+    if payload.get('q') != _query_digest(query) or offset < 0:
+        raise CursorError("Курсор выдан для другого запроса")
+    return offset, search_after
+
+
+def _continuation(ranked: Dict[str, Any], offset: int, top_n: int,
+                  after: Optional[List[Any]]) -> Optional[Tuple[List[Any], int, int]]:
+    
+    # (search_after, сколько пропустить, сколько дочитать) для части страницы за окном ранжированного списка;
+    # смещения за окном - позиции хитов Elasticsearch, как в выдаче BM25
+    window = _es_window(ranked)
+    remaining = top_n - len(ranked['ids'][offset:offset + top_n])
+    if remaining <= 0 or ranked.get('search_after') is None:
+        return None
+    if offset >= window and after is not None:
+        return after, 0, remaining
+    # без курсора глубокую страницу приходится отсчитывать от конца окна
+    return ranked['search_after'], max(offset - window, 0), remaining
+
+
+def _search_page_response(query: str, ranked: Dict[str, Any], offset: int, top_n: int,
+                          results: List[Dict[str, Any]], tail: Optional[List[Dict[str, Any]]],
+                          continuation: Optional[Tuple[List[Any], int, int]]) -> Dict[str, Any]:
+    
+    next_offset = offset + len(ranked['ids'][offset:offset + top_n])
+    if continuation is None:
+        has_more = next_offset < len(ranked['ids']) or (
+            ranked.get('search_after') is not None and next_offset == len(ranked['ids'])
+        )
+        if next_offset == len(ranked['ids']):
+            next_offset = _es_window(ranked)
+        next_cursor = encode_search_cursor(query, next_offset) if has_more else None
+    else:
+        _, skip, size = continuation
+        candidates = tail[skip:]
+        results = results + [
+            _format_result(candidate['doc_id'], candidate['bm25_score'], candidate['bm25_score'],
+                           _result_metadata(candidate))
+            for candidate in candidates
+        ]
+        next_offset = max(offset, _es_window(ranked)) + len(candidates)
+        # Elasticsearch вернул меньше, чем просили, значит выдача закончилась
+        has_more = bool(candidates) and len(tail) == skip + size
+        next_cursor = encode_search_cursor(query, next_offset, candidates[-1]['sort']) if has_more else None
+    
+    return {'results': results, 'offset': offset, 'next_cursor': next_cursor}
+
+
+def _bm25_ordering(ranked: Dict[str, Any]) -> Dict[str, Any]:
+
+    # окно ML - это топ BM25 кандидатов, поэтому их порядок BM25 восстанавливается сортировкой по скору,
+    # вторым ключом id, как в сортировке Elasticsearch
+    bm25_scores = ranked.get('bm25_scores', ranked['scores'])
+    order = sorted(range(len(ranked['ids'])), key=lambda i: (-bm25_scores[i], ranked['ids'][i]))
+    return _ranked_list(
+        [ranked['ids'][i] for i in order], [bm25_scores[i] for i in order], None, complete=True
+    )
+
+
+def _comparison(ranked: Dict[str, Any], bm25_ranked: Dict[str, Any],
+                metadata: Dict[int, Dict[str, Any]], top_n: int) -> Dict[str, Any]:
+    
+    ml_scores = dict(zip(ranked['ids'], ranked['scores']))
+    bm25_scores = dict(zip(bm25_ranked['ids'], bm25_ranked['scores']))
+    ml_ranks = {doc_id: rank for rank, doc_id in enumerate(ranked['ids'], 1)}
+    bm25_ranks = {doc_id: rank for rank, doc_id in enumerate(bm25_ranked['ids'], 1)}
+    
+    def with_ranks(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for result in results:
+            doc_id = result['id']
+            result['ml_score'] = ml_scores[doc_id]
+            result['bm25_score'] = bm25_scores[doc_id]
+            result['ml_rank'] = ml_ranks[doc_id]
+            result['bm25_rank'] = bm25_ranks[doc_id]
+            # положительная разница - ML поднял документ относительно BM25
+            result['rank_delta'] = bm25_ranks[doc_id] - ml_ranks[doc_id]
+        return results
+    
+    return {
+        'ml': with_ranks(_format_page(ranked, metadata, 0, top_n)),
+        'bm25': with_ranks(_format_page(bm25_ranked, metadata, 0, top_n)),
+        'overlap': len(set(ranked['ids'][:top_n]) & set(bm25_ranked['ids'][:top_n]))
+    }
+
+
+def _stream_event(stage: str, final: bool, page: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+
+    return {
+        'stage': stage,
+        'final': final,
+        **page,
+        'total_results': len(page['results']),
+        'search_time': time.time() - start_time
+    }
+
+
+def _enrich_candidate(candidate: Dict[str, Any], article_data: Dict[str, Any]) -> Dict[str, Any]:
+
+    return {
+        'id': candidate['doc_id'],
+        'title': article_data['title'],
+        'url': article_data['url'],
+        'text_content': article_data.get('text_content', ''),
+        'tags': article_data.get('tags', []),
+        'views': article_data.get('views', 0),
+        'score': article_data.get('score', 0),
+        'comments_count': article_data.get('comments_count', 0),
+        'word_count': article_data.get('word_count'),
+        'has_code': article_data.get('has_code'),
+        'has_images': article_data.get('has_images'),
+        'title_length': article_data.get('title_length'),
+        'tags_count': article_data.get('tags_count'),
+        'bm25_score': candidate['bm25_score'],
+        'highlights': candidate.get('highlights', {})
+    }
+
+
+def _enrich_candidates(candidates: List[Dict[str, Any]],
+                       articles_data: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    enriched_candidates = []
+    for candidate in candidates:
+        if 'text_content' in candidate:
+            enriched_candidates.append(_enrich_candidate(candidate, candidate))
+        elif candidate['doc_id'] in articles_data:
+            enriched_candidates.append(_enrich_candidate(candidate, articles_data[candidate['doc_id']]))
+    return enriched_candidates
+
+
+class AsyncSearchEngine:
+    
+    def __init__(self, ml_ranker: Optional[MLRanker] = None):
+
+        self.db_manager = AsyncDatabaseManager()
+        self.es_manager = AsyncElasticsearchManager()
+        self.redis_manager = AsyncRedisManager()
         
-        logger.info(f"SearchEngine инициализирован. ML модель готова: {self.ml_ranker.is_ready()}")
-        if self.ml_ranker.is_ready():
-            logger.info(f"Модель содержит {len(self.ml_ranker.feature_columns)} признаков")
+        self.ml_ranker = ml_ranker or get_ml_ranker()
+        self.single_flight = AsyncSingleFlight()
+        self.cache_stats = Counter()
+        local_caches = get_local_caches()
+        self.ranked_cache = local_caches['ranked']
+        self.metadata_cache = local_caches['metadata']
     
-    def bm25_search(self, query: str, top_n: int = 10) -> List[Dict[str, Any]]:
+    async def _get_articles_data(self, doc_ids: List[int]) -> Dict[int, Dict[str, Any]]:
 
-        start_time = time.time()
+        with stage_timer('redis_articles'):
+            fields = await self.redis_manager.get_cached_article_fields(doc_ids, ARTICLE_RANKING_FIELDS)
         
-        cached_results = self.redis_manager.get_cached_search_results(f"bm25_{query}", top_n)
-        if cached_results:
-            logger.info(f"BM25 поиск '{query}': {len(cached_results)} результатов из кэша")
-            return cached_results
+        missing_ids = [doc_id for doc_id in doc_ids if doc_id not in fields]
+        record_lookup('articles', 'redis', len(fields), len(missing_ids))
+        if missing_ids:
+            with stage_timer('postgres_enrichment'):
+                fetched = await self.db_manager.get_articles_by_habr_ids([str(doc_id) for doc_id in missing_ids])
+            backfill = {
+                doc_id: _ranking_fields(fetched[str(doc_id)]) for doc_id in missing_ids if str(doc_id) in fetched
+            }
+            if backfill:
+                await self.redis_manager.cache_article_fields(backfill)
+                fields.update(backfill)
         
-        candidates = self.es_manager.search_articles(query, top_n)
+        logger.debug(f"Обогащение: {len(doc_ids)} кандидатов, {len(missing_ids)} промахов кэша")
+        return {doc_id: dict(article, text_content=article['text_prefix']) for doc_id, article in fields.items()}
+    
+    async def _run_exclusive(self, key: str, compute, load_cached) -> RankedResult:
+
+        if not SEARCH_DISTRIBUTED_LOCK:
+            return await compute()
         
-        formatted_results = []
-        for candidate in candidates:
+        token = await self.redis_manager.acquire_lock(key, SEARCH_LOCK_TTL)
+        if token is not None:
             try:
-                doc_id = candidate['doc_id']
-                
-                article_data = self.redis_manager.get_cached_article_metadata(doc_id)
-                if not article_data:
-                    article_data = self.db_manager.get_article_by_habr_id(str(doc_id))
-                    if article_data:
-                        self.redis_manager.cache_article_metadata(doc_id, article_data)
-                
-                if article_data:
-                    result = {
-                        'id': doc_id,
-                        'title': article_data['title'],
-                        'url': article_data['url'],
-                        'score': candidate['bm25_score'],
-                        'bm25_score': candidate['bm25_score'],
-                        'ml_score': candidate['bm25_score'],  
-                        'views': article_data.get('views', 0),
-                        'comments_count': article_data.get('comments_count', 0),
-                        'tags': article_data.get('tags', []),
-                        'highlights': candidate.get('highlights', {})
-                    }
-                    formatted_results.append(result)
-            
-            except Exception as e:
-                logger.warning(f"Ошибка обработки кандидата {candidate.get('doc_id', 'unknown')}: {e}")
-                continue
+                return await compute()
+            finally:
+                await self.redis_manager.release_lock(key, token)
+        
+        self.single_flight.counters['lock_waits'] += 1
+        deadline = time.monotonic() + SEARCH_LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(SEARCH_LOCK_POLL_INTERVAL)
+            cached_results = await load_cached()
+            if cached_results is not None:
+                self.single_flight.counters['lock_cache_hits'] += 1
+                return cached_results
+        
+        self.single_flight.counters['lock_timeouts'] += 1
+        logger.warning(f"Не дождались результата другого воркера для '{key}', считаем сами")
+        return await compute()
+    
+    async def _get_results_metadata(self, doc_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+
+        metadata = self.metadata_cache.get_many(doc_ids)
+        
+        redis_ids = [doc_id for doc_id in doc_ids if doc_id not in metadata]
+        if redis_ids:
+            with stage_timer('redis_metadata'):
+                cached = await self.redis_manager.get_cached_article_fields(redis_ids, ARTICLE_DISPLAY_FIELDS)
+            record_lookup('metadata', 'redis', len(cached), len(redis_ids) - len(cached))
+            self.metadata_cache.set_many(cached)
+            metadata.update(cached)
+        
+        missing_ids = [doc_id for doc_id in redis_ids if doc_id not in metadata]
+        if missing_ids:
+            with stage_timer('postgres_metadata'):
+                fetched = await self.db_manager.get_articles_by_habr_ids([str(doc_id) for doc_id in missing_ids])
+            backfill = {
+                doc_id: _result_metadata(fetched[str(doc_id)]) for doc_id in missing_ids if str(doc_id) in fetched
+            }
+            if backfill:
+                await self.redis_manager.cache_article_fields(backfill)
+                self.metadata_cache.set_many(backfill)
+                metadata.update(backfill)
+        
+        self.cache_stats['metadata_hits'] += len(doc_ids) - len(missing_ids)
+        self.cache_stats['metadata_misses'] += len(missing_ids)
+        return metadata
+    
+    async def _cached_ranked_list(self, mode: str, version: str, query: str,
+                                  depth: int) -> Optional[Dict[str, Any]]:
+
+        local_key = _ranked_cache_key(mode, version, query)
+        ranked = self.ranked_cache.get(local_key)
+        if not _covers(ranked, depth):
+            with stage_timer('redis_ranked'):
+                ranked = await self.redis_manager.get_cached_ranked_list(mode, query, version)
+            record_lookup('ranked', 'redis', int(ranked is not None), int(ranked is None))
+            if ranked is not None:
+                self.ranked_cache.set(local_key, ranked)
+        
+        if _covers(ranked, depth):
+            self.cache_stats['ranked_hits'] += 1
+            return ranked
+        self.cache_stats['ranked_misses'] += 1
+        return None
+    
+    async def _get_ranked_list(self, mode: str, version: str, query: str, depth: int,
+                               compute) -> RankedResult:
+        
+        ranked = await self._cached_ranked_list(mode, version, query, depth)
+        if ranked is not None:
+            return ranked, None
+        return await self._compute_ranked_list(mode, version, query, depth, compute)
+    
+    async def _compute_ranked_list(self, mode: str, version: str, query: str, depth: int,
+                                   compute) -> RankedResult:
+        
+        local_key = _ranked_cache_key(mode, version, query)
+        key = _flight_key(mode, version, query, depth)
         
-        if formatted_results:
-            self.redis_manager.cache_search_results(f"bm25_{query}", top_n, formatted_results)
+        async def load_cached():
+            cached = await self.redis_manager.get_cached_ranked_list(mode, query, version)
+            return (cached, None) if _covers(cached, depth) else None
+        
+        async def run():
+            ranked, metadata = await self._run_exclusive(key, compute, load_cached)
+            # метаданные есть только у посчитанного здесь списка, дождавшийся другого воркера их не пишет
+            if metadata is not None and ranked['ids']:
+                await self.redis_manager.cache_article_fields(metadata)
+                await self.redis_manager.cache_ranked_list(mode, query, version, ranked)
+                self.metadata_cache.set_many(metadata)
+            if ranked['ids']:
+                self.ranked_cache.set(local_key, ranked)
+            return ranked, metadata
+        
+        return await self.single_flight.do(key, run)
+    
+    async def _ranked_page(self, query: str, ranked: Dict[str, Any],
+                           metadata: Optional[Dict[int, Dict[str, Any]]], offset: int, top_n: int,
+                           after: Optional[List[Any]] = None) -> Dict[str, Any]:
+        
+        # страницы внутри окна - срез закэшированного списка
+        if metadata is None:
+            metadata = await self._get_results_metadata(ranked['ids'][offset:offset + top_n])
+        results = _format_page(ranked, metadata, offset, top_n)
+        
+        # за окном выдача продолжается в порядке BM25 через search_after, не пересчитывая окно
+        continuation = _continuation(ranked, offset, top_n, after)
+        tail = None
+        if continuation is not None:
+            search_after, skip, size = continuation
+            with stage_timer('elasticsearch_search_after'):
+                tail = await self.es_manager.search_articles(query, skip + size, search_after=search_after)
+        return _search_page_response(query, ranked, offset, top_n, results, tail, continuation)
+    
+    async def _normalized_page(self, query: str, top_n: int, offset: int, after: Optional[List[Any]],
+                               mode: str, version: str, depth: int) -> Dict[str, Any]:
+        
+        start_time = time.time()
+        if mode == 'ml':
+            compute = lambda: self._ml_rank(query)
+        else:
+            compute = lambda: self._bm25_rank(query, depth)
+        
+        ranked, metadata = await self._get_ranked_list(mode, version, query, depth, compute)
+        page = await self._ranked_page(query, ranked, metadata, offset, top_n, after)
         
         search_time = time.time() - start_time
-        logger.info(f"BM25 поиск '{query}': {len(formatted_results)} результатов за {search_time:.3f}с")
+        logger.info(
+            f"{mode.upper()} поиск '{query}' (offset {offset}): {len(page['results'])} результатов "
+            f"за {search_time:.3f}с"
+        )
         
-        return formatted_results
+        return page
     
-    def smart_search(self, query: str, top_n: int = 10) -> List[Dict[str, Any]]:
+    async def search_page(self, query: str, top_n: int = 10, offset: int = 0, cursor: str = None,
+                          use_ml: bool = True) -> Dict[str, Any]:
+        
+        query = normalize_query(query)
+        after = None
+        if cursor is not None:
+            offset, after = decode_search_cursor(cursor, query)
+        
+        mode, version, depth = _ranking_mode(self.ml_ranker, use_ml)
+        return await self._normalized_page(query, top_n, offset, after, mode, version, depth)
+    
+    async def search_page_bytes(self, query: str, top_n: int = 10, offset: int = 0, cursor: str = None,
+                                use_ml: bool = True) -> bytes:
+        
+        query = normalize_query(query)
+        after = None
+        if cursor is not None:
+            offset, after = decode_search_cursor(cursor, query)
+        mode, version, depth = _ranking_mode(self.ml_ranker, use_ml)
+        
+        # страницы за окном (search_after из курсора) не кэшируются: ключ не определяется offset
+        cacheable = SEARCH_RESPONSE_CACHE and after is None
+        if cacheable:
+            with stage_timer('redis_page'):
+                body = await self.redis_manager.get_cached_page_bytes(mode, query, version, offset, top_n)
+            record_lookup('page', 'redis', int(body is not None), int(body is None))
+            if body is not None:
+                self.cache_stats['page_hits'] += 1
+                return body
+            self.cache_stats['page_misses'] += 1
+        
+        page = await self._normalized_page(query, top_n, offset, after, mode, version, depth)
+        body = json_dumps({**page, 'total_results': len(page['results'])})
+        if cacheable and page['results']:
+            await self.redis_manager.cache_page_bytes(
+                mode, query, version, offset, top_n, body, SEARCH_RESPONSE_CACHE_TTL
+            )
+        return body
+    
+    async def bm25_search(self, query: str, top_n: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        return (await self.search_page(query, top_n, offset, use_ml=False))['results']
+    
+    async def _bm25_rank(self, query: str, depth: int) -> RankedResult:
+
+        with stage_timer('elasticsearch_search'):
+            candidates = await self.es_manager.search_articles(query, depth)
+        return _bm25_ranked_list(candidates, depth)
+    
+    async def smart_search(self, query: str, top_n: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        return (await self.search_page(query, top_n, offset))['results']
+    
+    async def compare_search(self, query: str, top_n: int = 10) -> Dict[str, Any]:
 
         start_time = time.time()
+        query = normalize_query(query)
+        mode, version, depth = _ranking_mode(self.ml_ranker, True)
+        if mode == 'ml':
+            compute = lambda: self._ml_rank(query)
+        else:
+            compute = lambda: self._bm25_rank(query, depth)
         
-        if not self.ml_ranker.is_ready():
-            logger.warning("ML модель не готова, используем BM25 поиск")
-            return self.bm25_search(query, top_n)
+        # обе выдачи строятся из одного ранжированного списка ML: в нем есть и ML, и BM25 скоры окна
+        ranked, metadata = await self._get_ranked_list(mode, version, query, depth, compute)
+        bm25_ranked = _bm25_ordering(ranked)
+        if metadata is None:
+            metadata = await self._get_results_metadata(
+                list(dict.fromkeys(ranked['ids'][:top_n] + bm25_ranked['ids'][:top_n]))
+            )
+        comparison = _comparison(ranked, bm25_ranked, metadata, top_n)
         
-        cached_results = self.redis_manager.get_cached_search_results(f"ml_{query}", top_n)
-        if cached_results:
-            logger.info(f"ML поиск '{query}': {len(cached_results)} результатов из кэша")
-            return cached_results
+        search_time = time.time() - start_time
+        logger.info(f"Сравнение '{query}': пересечение {comparison['overlap']} из {top_n} за {search_time:.3f}с")
         
+        return {'mode': mode, **comparison}
+    
+    async def search_stream(self, query: str, top_n: int = 10) -> AsyncIterator[Dict[str, Any]]:
 
-        candidates = self.es_manager.search_articles(query, 100)
+        start_time = time.time()
+        query = normalize_query(query)
+        mode, version, depth = _ranking_mode(self.ml_ranker, True)
+        
+        ranked = await self._cached_ranked_list(mode, version, query, depth)
+        metadata = None
+        if ranked is None and mode == 'ml':
+            # BM25 выдача готова сразу после Elasticsearch, ML порядок приходит следующим событием
+            with stage_timer('elasticsearch_search'):
+                candidates = await self.es_manager.search_articles(query, ML_CANDIDATES_COUNT)
+            bm25_ranked, bm25_metadata = _bm25_ranked_list(candidates, ML_CANDIDATES_COUNT)
+            bm25_page = {
+                'results': _format_page(bm25_ranked, bm25_metadata, 0, top_n), 'offset': 0, 'next_cursor': None
+            }
+            yield _stream_event('bm25', not candidates, bm25_page, start_time)
+            if not candidates:
+                return
+            ranked, metadata = await self._compute_ranked_list(
+                mode, version, query, depth, lambda: self._ml_rank_candidates(query, candidates)
+            )
+        elif ranked is None:
+            ranked, metadata = await self._compute_ranked_list(
+                mode, version, query, depth, lambda: self._bm25_rank(query, depth)
+            )
         
+        page = await self._ranked_page(query, ranked, metadata, 0, top_n)
+        logger.info(f"Потоковый {mode.upper()} поиск '{query}': {len(page['results'])} результатов "
+                    f"за {time.time() - start_time:.3f}с")
+        yield _stream_event(mode, True, page, start_time)
+    
+    async def _ml_rank(self, query: str) -> RankedResult:
+
+        with stage_timer('elasticsearch_search'):
+            candidates = await self.es_manager.search_articles(query, ML_CANDIDATES_COUNT)
+        return await self._ml_rank_candidates(query, candidates)
+    
+    async def _ml_rank_candidates(self, query: str, candidates: List[Dict[str, Any]]) -> RankedResult:
+
         if not candidates:
             logger.info(f"ML поиск '{query}': кандидаты не найдены")
-            return []
+            return _ranked_list([], [], [], complete=True), {}
         
         logger.info(f"ML поиск '{query}': получено {len(candidates)} кандидатов от BM25")
         
-        enriched_candidates = []
-        for candidate in candidates:
-            try:
-                doc_id = candidate['doc_id']
-                
-                article_data = self.redis_manager.get_cached_article_metadata(doc_id)
-                if not article_data:
-                    article_data = self.db_manager.get_article_by_habr_id(str(doc_id))
-                    if article_data:
-                        self.redis_manager.cache_article_metadata(doc_id, article_data)
-                
-                if article_data:
-                    enriched_candidate = {
-                        'id': doc_id,
-                        'title': article_data['title'],
-                        'url': article_data['url'],
-                        'text_content': article_data.get('text_content', ''),
-                        'tags': article_data.get('tags', []),
-                        'views': article_data.get('views', 0),
-                        'score': article_data.get('score', 0),
-                        'comments_count': article_data.get('comments_count', 0),
-                        'bm25_score': candidate['bm25_score'],
-                        'highlights': candidate.get('highlights', {})
-                    }
-                    enriched_candidates.append(enriched_candidate)
-            
-            except Exception as e:
-                logger.warning(f"Ошибка обработки кандидата {candidate.get('doc_id', 'unknown')}: {e}")
-                continue
+        missing_ids = [candidate['doc_id'] for candidate in candidates if 'text_content' not in candidate]
+        articles_data = await self._get_articles_data(missing_ids) if missing_ids else {}
+        
+        enriched_candidates = _enrich_candidates(candidates, articles_data)
         
         if not enriched_candidates:
+            record_candidates(len(candidates), 0, 0)
             logger.warning(f"ML поиск '{query}': не удалось обогатить ни одного кандидата")
-            return []
+            return _ranked_list([], [], [], complete=True), {}
         
         logger.info(f"ML поиск '{query}': обогащено {len(enriched_candidates)} кандидатов")
         
-        ml_ranked_candidates = self.ml_ranker.rank_candidates(query, enriched_candidates)
-        
-        formatted_results = []
-        for candidate in ml_ranked_candidates[:top_n]:
-            result = {
-                'id': candidate['id'],
-                'title': candidate['title'],
-                'url': candidate['url'],
-                'score': candidate.get('ml_score', candidate['bm25_score']),
-                'ml_score': candidate.get('ml_score', candidate['bm25_score']),
-                'bm25_score': candidate['bm25_score'],
-                'views': candidate.get('views', 0),
-                'comments_count': candidate.get('comments_count', 0),
-                'tags': candidate.get('tags', []),
-                'highlights': candidate.get('highlights', {})
-            }
-            formatted_results.append(result)
-        
-        if formatted_results:
-            self.redis_manager.cache_search_results(f"ml_{query}", top_n, formatted_results)
+        # ранжирование CPU-bound, выносим его из event loop
+        ml_ranked_candidates = await asyncio.get_running_loop().run_in_executor(
+            None, self.ml_ranker.rank_candidates, query, enriched_candidates
+        )
+        record_candidates(len(candidates), len(enriched_candidates), len(ml_ranked_candidates))
         
-        search_time = time.time() - start_time
-        logger.info(f"ML поиск '{query}': {len(formatted_results)} результатов за {search_time:.3f}с")
+        return _ml_ranked_list(ml_ranked_candidates, candidates)
+    
+    async def _timed_cached_ranked_list(self, mode: str, version: str, query: str,
+                                        depth: int) -> Tuple[Optional[Dict[str, Any]], float]:
         
-        return formatted_results
+        start_time = time.time()
+        ranked = await self._cached_ranked_list(mode, version, query, depth)
+        return ranked, time.time() - start_time
     
-    def get_search_stats(self) -> Dict[str, Any]:
+    async def _bm25_rank_many(self, queries: List[str], depth: int) -> List[RankedResult]:
 
-        try:
-            db_stats = {
-                'total_articles': self.db_manager.get_articles_count()
-            }
-            
-            es_stats = self.es_manager.get_index_stats()
+        with stage_timer('elasticsearch_msearch'):
+            candidate_lists = await self.es_manager.search_articles_many(queries, depth)
+        return [_bm25_ranked_list(candidates, depth) for candidates in candidate_lists]
+    
+    async def _ml_rank_many(self, queries: List[str]) -> List[RankedResult]:
+
+        with stage_timer('elasticsearch_msearch'):
+            candidate_lists = await self.es_manager.search_articles_many(queries, ML_CANDIDATES_COUNT)
+        
+        # одно обогащение на все запросы пачки, общие кандидаты читаются один раз
+        missing_ids = list(dict.fromkeys(
+            candidate['doc_id']
+            for candidates in candidate_lists for candidate in candidates if 'text_content' not in candidate
+        ))
+        articles_data = await self._get_articles_data(missing_ids) if missing_ids else {}
+        
+        groups = [
+            (query, _enrich_candidates(candidates, articles_data))
+            for query, candidates in zip(queries, candidate_lists)
+        ]
+        ranked_groups = await asyncio.get_running_loop().run_in_executor(
+            None, self.ml_ranker.rank_candidates_many, groups
+        )
+        record_candidates(
+            sum(len(candidates) for candidates in candidate_lists),
+            sum(len(candidates) for _, candidates in groups),
+            sum(len(ranked_candidates) for ranked_candidates in ranked_groups)
+        )
+        
+        return [
+            _ml_ranked_list(ranked_candidates, candidates)
+            for ranked_candidates, candidates in zip(ranked_groups, candidate_lists)
+        ]
+    
+    async def batch_search(self, queries: List[str], top_n: int = 10,
+                           use_ml: bool = True) -> List[Dict[str, Any]]:
+        
+        start_time = time.time()
+        normalized = [normalize_query(query) for query in queries]
+        unique_queries = list(dict.fromkeys(normalized))
+        mode, version, depth = _ranking_mode(self.ml_ranker, use_ml)
+        
+        lookups = await asyncio.gather(*[
+            self._timed_cached_ranked_list(mode, version, query, depth) for query in unique_queries
+        ])
+        ranked_lists = {query: ranked for query, (ranked, _) in zip(unique_queries, lookups) if ranked is not None}
+        timings = {query: lookup_time for query, (_, lookup_time) in zip(unique_queries, lookups)}
+        
+        # промахи кэша считаются вместе: один msearch, одно обогащение, один predict
+        missing = [query for query in unique_queries if query not in ranked_lists]
+        metadata = {}
+        if missing:
+            compute_start = time.time()
+            computed = await (self._ml_rank_many(missing) if mode == 'ml' else self._bm25_rank_many(missing, depth))
+            for query, (ranked, query_metadata) in zip(missing, computed):
+                ranked_lists[query] = ranked
+                metadata.update(query_metadata)
             
-            ml_stats = self.ml_ranker.get_model_info()
+            await self.redis_manager.cache_article_fields(metadata)
+            self.metadata_cache.set_many(metadata)
+            stored = {query: ranked_lists[query] for query in missing if ranked_lists[query]['ids']}
+            await asyncio.gather(*[
+                self.redis_manager.cache_ranked_list(mode, query, version, ranked) for query, ranked in stored.items()
+            ])
+            self.ranked_cache.set_many({
+                _ranked_cache_key(mode, version, query): ranked for query, ranked in stored.items()
+            })
             
-            return {
-                'database': db_stats,
-                'elasticsearch': es_stats,
-                'ml_model': ml_stats
-            }
-        except Exception as e:
-            logger.error(f"Ошибка получения статистики: {e}")
-            return {
-                'database': {'total_articles': 0},
-                'elasticsearch': {'total_docs': 0},
-                'ml_model': {'ready': False}
+            compute_time = time.time() - compute_start
+            for query in missing:
+                timings[query] += compute_time
+        
+        page_ids = list(dict.fromkeys(
+            doc_id for ranked in ranked_lists.values() for doc_id in ranked['ids'][:top_n] if doc_id not in metadata
+        ))
+        if page_ids:
+            metadata.update(await self._get_results_metadata(page_ids))
+        
+        logger.info(
+            f"Пакетный {mode.upper()} поиск: {len(queries)} запросов, {len(missing)} посчитано, "
+            f"за {time.time() - start_time:.3f}с"
+        )
+        
+        return [
+            {
+                'query': query,
+                'results': _format_page(ranked_lists[normalized_query], metadata, 0, top_n),
+                'search_time': timings[normalized_query],
+                'cached': normalized_query not in missing
             }
+            for query, normalized_query in zip(queries, normalized)
+        ]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+
+        return {
+            **self.cache_stats,
+            'local': {'ranked': self.ranked_cache.get_stats(), 'metadata': self.metadata_cache.get_stats()}
+        }
+    
+    async def get_database_stats(self) -> Optional[Dict[str, Any]]:
+
+        stats = await self.redis_manager.get_cached_stats()
+        if stats is not None:
+            return stats
+        
+        # агрегаты считает PostgreSQL, хабы берутся из материализованного представления hub_stats
+        stats = await self.db_manager.get_database_stats()
+        if stats is not None:
+            await self.redis_manager.cache_stats(stats, STATS_CACHE_TTL)
+        return stats
+    
+    async def close(self):
+
+        await self.es_manager.close()
+        await self.redis_manager.close()
+        await self.db_manager.close()
+
+def get_async_search_engine() -> AsyncSearchEngine:
+
+    global _async_search_engine
+    if _async_search_engine is None:
+        _async_search_engine = AsyncSearchEngine()
+    return _async_search_engine
 
-def get_search_engine() -> SearchEngine:
+async def close_async_search_engine():
 
-    global _search_engine
-    if _search_engine is None:
-        _search_engine = SearchEngine()
-    return _search_engine
+    global _async_search_engine
+    if _async_search_engine is not None:
+        await _async_search_engine.close()
+        _async_search_engine = None
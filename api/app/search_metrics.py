@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+# от попаданий в локальный кэш (доли миллисекунды) до холодного ML ранжирования (секунды)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SEARCH_STAGE_DURATION = Histogram(
+    'search_stage_duration_seconds', 'Время этапов поиска',
+    ['stage'], buckets=STAGE_BUCKETS
+)
+SEARCH_CANDIDATES = Counter(
+    'search_candidates_total', 'Кандидаты ML ранжирования: получены от BM25, обогащены, ранжированы',
+    ['stage']
+)
+ML_FALLBACKS = Counter(
+    'search_ml_fallback_total', 'Выдачи в порядке BM25 вместо ML ранжирования',
+    ['reason']
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        SEARCH_STAGE_DURATION.labels(stage).observe(time.perf_counter() - start_time)
+
+
+def record_candidates(retrieved: int, enriched: int, ranked: int):
+
+    SEARCH_CANDIDATES.labels('retrieved').inc(retrieved)
+    SEARCH_CANDIDATES.labels('enriched').inc(enriched)
+    SEARCH_CANDIDATES.labels('ranked').inc(ranked)
+
+
+def record_ml_fallback(reason: str, count: int = 1):
+    ML_FALLBACKS.labels(reason).inc(count)
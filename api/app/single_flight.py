@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+def _consume_exception(task: asyncio.Task):
+    # если все ожидающие отменены, исключение задачи никто не прочитает и asyncio ругается в лог
+    if not task.cancelled():
+        task.exception()
+
+
+class AsyncSingleFlight:
+
+    def __init__(self):
+
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.counters = Counter()
+    
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+
+        task = self._calls.get(key)
+        if task is not None:
+            self.counters['coalesced'] += 1
+        else:
+            # вычисление идет в отдельной задаче: отмена запроса, который его начал (клиент отключился),
+            # не отменяет ожидающие тот же результат запросы
+            task = self._calls[key] = asyncio.get_running_loop().create_task(self._run(key, func))
+            task.add_done_callback(_consume_exception)
+            self.counters['executions'] += 1
+        return await asyncio.shield(task)
+    
+    async def _run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+
+        try:
+            return await func()
+        except Exception:
+            self.counters['errors'] += 1
+            raise
+        finally:
+            del self._calls[key]
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.counters, 'in_flight': len(self._calls)}
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import json
 import time
+import asyncio
 import sys
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src'))
 
-from app.models import SearchRequest, SearchResponse, SearchResult
-from db_manager import DatabaseManager
-from elasticsearch_manager import ElasticsearchManager
-from app.search_engine import get_search_engine
+from app.models import (
+    SearchRequest, SearchResponse, SearchResult, BatchSearchRequest, BatchSearchItem, BatchSearchResponse,
+    CompareRequest, CompareResponse, ArticlePage
+)
+from db_manager import CursorError, decode_cursor
+from app.search_engine import get_async_search_engine, get_ml_ranker
+from app.responses import FastJSONResponse, merge_json_object
 
 router = APIRouter(prefix="/api", tags=["search"])
 
@@ -18,86 +24,105 @@ async def search_articles(request: SearchRequest):
     try:
         start_time = time.time()
         
-        search_engine = get_search_engine()
+        search_engine = get_async_search_engine()
         
-        if request.compare:
-            search_results = search_engine.bm25_search(request.query, request.top_n)
-            results = [
-                SearchResult(
-                    id=result['id'],
-                    title=result['title'],
-                    url=result['url'],
-                    score=result['score'],
-                    ml_score=result['score'],
-                    bm25_score=result['score'],
-                    views=result['views'],
-                    comments_count=result['comments_count'],
-                    tags=result['tags']
-                )
-                for result in search_results
-            ]
-        else:
-            search_results = search_engine.smart_search(request.query, request.top_n)
-            results = [
-                SearchResult(
-                    id=result['id'],
-                    title=result['title'],
-                    url=result['url'],
-                    score=result['score'],
-                    ml_score=result['ml_score'],
-                    bm25_score=result['bm25_score'],
-                    views=result['views'],
-                    comments_count=result['comments_count'],
-                    tags=result['tags']
-                )
-                for result in search_results
-            ]
-        
-        search_time = time.time() - start_time
-        
-        return SearchResponse(
-            query=request.query,
-            results=results,
-            total_results=len(results),
-            search_time=search_time
+        # курсор следующей страницы приоритетнее offset
+        body = await search_engine.search_page_bytes(
+            request.query, request.top_n, request.offset, request.cursor, use_ml=not request.compare
         )
         
+        # страница уже закодирована в JSON: поля запроса дописываются к байтам без сборки SearchResult
+        return FastJSONResponse(merge_json_object(
+            {'query': request.query, 'search_time': time.time() - start_time}, body
+        ))
+        
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка поиска: {str(e)}")
 
-@router.get("/stats")
-async def get_database_stats():
+@router.post("/search/stream")
+async def stream_search_articles(request: SearchRequest):
+    search_engine = get_async_search_engine()
+    
+    async def events():
+        # NDJSON: строка на событие - сначала BM25 выдача, затем ML порядок с final=true
+        try:
+            async for event in search_engine.search_stream(request.query, request.top_n):
+                yield json.dumps({'query': request.query, **event}, ensure_ascii=False) + '\n'
+        except Exception as e:
+            yield json.dumps({'stage': 'error', 'final': True, 'detail': f"Ошибка поиска: {str(e)}"},
+                             ensure_ascii=False) + '\n'
+    
+    # без X-Accel-Buffering nginx копит ответ целиком и первое событие не доходит раньше последнего
+    return StreamingResponse(events(), media_type='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@router.post("/compare", response_model=CompareResponse)
+async def compare_search(request: CompareRequest):
     try:
-        search_engine = get_search_engine()
-        
-        search_stats = search_engine.get_search_stats()
+        start_time = time.time()
         
-        db_manager = DatabaseManager()
-        articles = db_manager.get_articles_for_search()
+        comparison = await get_async_search_engine().compare_search(request.query, request.top_n)
         
-        total_views = sum(article.get('views', 0) for article in articles)
-        total_articles = len(articles)
-        avg_views = total_views / total_articles if total_articles > 0 else 0
+        return CompareResponse(
+            query=request.query,
+            search_time=time.time() - start_time,
+            **comparison
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка сравнительного поиска: {str(e)}")
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def batch_search_articles(request: BatchSearchRequest):
+    try:
+        start_time = time.time()
         
-        hub_counts = {}
-        for article in articles:
-            tags = article.get('tags', []) or []
-            for tag in tags:
-                hub_counts[tag] = hub_counts.get(tag, 0) + 1
+        search_engine = get_async_search_engine()
+        batch = await search_engine.batch_search(request.queries, request.top_n, use_ml=not request.compare)
         
-        top_hubs = [
-            {'hub': hub, 'count': count}
-            for hub, count in sorted(hub_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        results = [
+            BatchSearchItem(
+                query=item['query'],
+                results=[SearchResult(**result) for result in item['results']],
+                total_results=len(item['results']),
+                search_time=item['search_time'],
+                cached=item['cached']
+            )
+            for item in batch
         ]
         
+        return BatchSearchResponse(
+            results=results,
+            total_queries=len(results),
+            search_time=time.time() - start_time
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка пакетного поиска: {str(e)}")
+
+@router.get("/stats")
+async def get_database_stats():
+    try:
+        search_engine = get_async_search_engine()
+        
+        # статистика индекса через AsyncElasticsearch: синхронный клиент блокировал бы event loop
+        db_stats, es_stats = await asyncio.gather(
+            search_engine.get_database_stats(), search_engine.es_manager.get_index_stats()
+        )
+        db_stats = db_stats or {}
+        
         return {
-            'total_articles': total_articles,
-            'total_views': total_views,
-            'avg_views': avg_views,
-            'top_hubs': top_hubs,
-            'es_index_size': search_stats.get('elasticsearch', {}).get('index_size', 0),
-            'es_total_docs': search_stats.get('elasticsearch', {}).get('total_docs', 0),
-            'ml_model': search_stats.get('ml_model', {})
+            'total_articles': db_stats.get('total_articles', 0),
+            'total_views': db_stats.get('total_views', 0),
+            'avg_views': db_stats.get('avg_views', 0),
+            'top_hubs': db_stats.get('top_hubs', []),
+            'es_index_size': es_stats.get('index_size', 0),
+            'es_total_docs': es_stats.get('total_docs', 0),
+            'ml_model': search_engine.ml_ranker.get_model_info(),
+            'db_pool': search_engine.db_manager.get_pool_stats(),
+            'single_flight': search_engine.single_flight.get_stats(),
+            'result_cache': search_engine.get_cache_stats()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения статистики: {str(e)}")
@@ -106,8 +131,7 @@ async def get_database_stats():
 @router.get("/ml-model/status")
 async def get_ml_model_status():
     try:
-        search_engine = get_search_engine()
-        ml_stats = search_engine.ml_ranker.get_model_info()
+        ml_stats = get_ml_ranker().get_model_info()
         
         return {
             'status': 'ready' if ml_stats.get('ready', False) else 'not_ready',
@@ -119,20 +143,29 @@ async def get_ml_model_status():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения статуса ML модели: {str(e)}")
 
-@router.get("/top-articles")
-async def get_top_articles(limit: int = 10):
+def _parse_cursor(cursor: Optional[str]):
+
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/top-articles", response_model=ArticlePage)
+async def get_top_articles(limit: int = Query(10, ge=1, le=100), cursor: Optional[str] = None):
+    after = _parse_cursor(cursor)
     try:
-        db_manager = DatabaseManager()
-        articles = db_manager.get_top_articles(limit)
-        return articles
+        db_manager = get_async_search_engine().db_manager
+        return await db_manager.get_top_articles(limit, after=after)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения топ статей: {str(e)}")
 
-@router.get("/articles/hub/{hub}")
-async def get_articles_by_hub(hub: str, limit: int = 20):
+@router.get("/articles/hub/{hub}", response_model=ArticlePage)
+async def get_articles_by_hub(hub: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    after = _parse_cursor(cursor)
     try:
-        db_manager = DatabaseManager()
-        articles = db_manager.search_articles_by_title(hub, limit)
-        return articles
+        db_manager = get_async_search_engine().db_manager
+        return await db_manager.get_articles_by_hub(hub, limit, after=after)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения статей по хабу: {str(e)}")
@@ -0,0 +1,155 @@
+import os
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+from app.ml_ranker import MLRanker
+from document_features import STATIC_FEATURE_COLUMNS, compute_static_features
+from tfidf_store import document_text
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+VOCABULARY = [
+    'python', 'машинное', 'обучение', 'данные', 'модель', 'сервер', 'база', 'запрос',
+    'индекс', 'поиск', 'javascript', 'react', 'kubernetes', 'docker', 'сеть', 'нейронная',
+    'алгоритм', 'оптимизация', 'производительность', 'кэш', 'redis', 'postgresql', 'linux',
+    'архитектура', 'микросервисы', 'тестирование', 'разработка', 'frontend', 'backend', 'api'
+]
+
+
+def make_candidates(n: int, rng: random.Random) -> list:
+
+    candidates = []
+    for i in range(n):
+        text = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(150, 400)))
+        title = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(3, 8)))
+        tags = [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 4))]
+        candidates.append({
+            'id': i,
+            'title': title,
+            'text_content': text[:1000],
+            **compute_static_features(title, text, tags),
+            'tags': tags,
+            'views': rng.randint(0, 100000),
+            'comments_count': rng.randint(0, 500),
+            'score': rng.randint(-10, 200),
+            'bm25_score': rng.random() * 20
+        })
+    return candidates
+
+
+def reference_features(ranker: MLRanker, query: str, doc: dict) -> list:
+
+    # замороженная копия поштучной генерации признаков (до build_feature_matrix): на каждого кандидата
+    # отдельный transform TF-IDF для запроса и документа, токенизация и статические признаки заново;
+    # признаки те же, что в FEATURE_SPEC, поэтому результат сверяется с батчем
+    def tokens(text):
+        if not text:
+            return set()
+        return {word for word in re.sub(r'[^\w\s]', ' ', str(text).lower()).split() if len(word) > 2}
+    
+    views = doc.get('views', 0) or 0
+    title = doc.get('title', '') or ''
+    text_content = doc.get('text_content', '') or ''
+    tags = doc.get('tags', []) or []
+    
+    static = doc if all(doc.get(column) is not None for column in STATIC_FEATURE_COLUMNS) \
+        else compute_static_features(title, text_content, tags)
+    
+    tfidf_similarity = 0.0
+    if ranker.tfidf_vectorizer and text_content:
+        query_vec = ranker.tfidf_vectorizer.transform([query])
+        doc_vec = ranker.tfidf_vectorizer.transform([document_text(title, text_content)])
+        tfidf_similarity = float((query_vec * doc_vec.T).toarray()[0][0])
+    
+    query_words = tokens(query)
+    query_lower = query.lower().strip()
+    text_overlap_ratio = 0.0
+    if query_words:
+        text_overlap_ratio = len(query_words & tokens(text_content[:1000])) / len(query_words)
+    
+    return [
+        float(max(1, 100 - min(99, views // 100))),
+        float(doc.get('score', 0) or 0),
+        float(views),
+        float(doc.get('comments_count', 0) or 0),
+        float(static['word_count']),
+        float(static['has_code']),
+        float(static['has_images']),
+        float(static['title_length']),
+        float(static['tags_count']),
+        tfidf_similarity,
+        1.0 if query_words & tokens(title) else 0.0,
+        1.0 if any(query_lower == str(tag).lower().strip() for tag in tags) else 0.0,
+        text_overlap_ratio,
+        float(len(query.split()))
+    ]
+
+
+def make_ranker(rng: random.Random) -> MLRanker:
+
+    ranker = MLRanker(model_path='/nonexistent', feature_info_path='/nonexistent', tfidf_path='/nonexistent')
+    corpus = [' '.join(rng.choice(VOCABULARY) for _ in range(200)) for _ in range(500)]
+    ranker.tfidf_vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 2)).fit(corpus)
+    return ranker
+
+
+def time_call(func, repeats: int) -> float:
+
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк генерации признаков MLRanker')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    ranker = make_ranker(rng)
+    query = 'машинное обучение python'
+    
+    for size in args.sizes:
+        candidates = make_candidates(size, rng)
+        
+        def per_candidate():
+            return np.array([
+                reference_features(ranker, query, candidate)
+                for candidate in candidates
+            ])
+        
+        def batch():
+            return ranker.generate_features_batch(query, candidates)
+        
+        if not np.allclose(per_candidate(), batch()):
+            logger.error(f"n={size}: признаки батча не совпадают с поштучными")
+            return 1
+        
+        before = time_call(per_candidate, args.repeats)
+        after = time_call(batch, args.repeats)
+        logger.info(
+            f"n={size:>5}  поштучно={before * 1000:8.2f}ms  батч={after * 1000:8.2f}ms  "
+            f"ускорение={before / after:5.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
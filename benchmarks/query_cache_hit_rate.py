@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import random
+import logging
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from query_normalizer import QueryNormalizer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_QUERIES = [
+    "машинное обучение",
+    "python разработка",
+    "javascript веб",
+    "база данных",
+    "искусственный интеллект",
+    "kubernetes",
+    "postgresql индексы",
+    "react хуки",
+]
+
+LogEntry = Tuple[str, int, Optional[float]]
+
+
+def load_query_log(path: str, default_top_n: int) -> List[LogEntry]:
+
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if line.lstrip().startswith('{'):
+                record = json.loads(line)
+                entries.append((record['query'], int(record.get('top_n', default_top_n)), record.get('ts')))
+            else:
+                entries.append((line, default_top_n, None))
+    return entries
+
+
+def make_synthetic_log(size: int, top_n: int, rng: random.Random) -> List[LogEntry]:
+
+    def variant(query: str) -> str:
+        words = [word.upper() if rng.random() < 0.2 else word.capitalize() if rng.random() < 0.2 else word
+                 for word in query.split()]
+        separator = '  ' if rng.random() < 0.2 else ' '
+        return (' ' if rng.random() < 0.1 else '') + separator.join(words) + (' ' if rng.random() < 0.2 else '')
+    
+    weights = [1.0 / rank for rank in range(1, len(SYNTHETIC_QUERIES) + 1)]
+    return [
+        (variant(rng.choices(SYNTHETIC_QUERIES, weights)[0]), top_n, float(i))
+        for i in range(size)
+    ]
+
+
+def replay(entries: List[LogEntry], make_key: Callable[[str], str], ttl: float) -> Dict[str, float]:
+
+    cached_at: Dict[Tuple[str, int], float] = {}
+    hits = 0
+    for i, (query, top_n, ts) in enumerate(entries):
+        now = ts if ts is not None else float(i)
+        key = (make_key(query), top_n)
+        if key in cached_at and (ttl <= 0 or now - cached_at[key] < ttl):
+            hits += 1
+        else:
+            cached_at[key] = now
+    return {
+        'requests': len(entries),
+        'unique_keys': len(cached_at),
+        'hits': hits,
+        'hit_rate': hits / len(entries) if entries else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hit rate кэша поиска на проигранном логе запросов')
+    parser.add_argument('--log', type=str, default=None,
+                        help='Лог запросов: строка на запрос или JSON {"query", "top_n", "ts"}')
+    parser.add_argument('--synthetic', type=int, default=5000, help='Размер синтетического лога без --log')
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--ttl', type=float, default=600, help='TTL кэша в секундах (0 - без истечения)')
+    args = parser.parse_args()
+    
+    if args.log:
+        entries = load_query_log(args.log, args.top_n)
+    else:
+        entries = make_synthetic_log(args.synthetic, args.top_n, random.Random(42))
+    logger.info(f"Запросов в логе: {len(entries)}")
+    
+    strategies = {
+        'raw': lambda query: query,
+        'canonical': QueryNormalizer(lemmatize_queries=False).normalize,
+    }
+    lemma_normalizer = QueryNormalizer(lemmatize_queries=True)
+    if lemma_normalizer.lemmatize_queries:
+        strategies['lemma'] = lemma_normalizer.normalize
+    
+    for name, make_key in strategies.items():
+        result = replay(entries, make_key, args.ttl)
+        logger.info(
+            f"{name:>10}: ключей={result['unique_keys']:>6}  попаданий={result['hits']:>6}  "
+            f"hit_rate={result['hit_rate'] * 100:6.2f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cache_codec import CacheCodec, available_codecs
+from redis_manager import ARTICLE_DISPLAY_FIELDS, ARTICLE_RANKING_FIELDS
+from elasticsearch_manager import TEXT_PREFIX_LENGTH
+from document_features import compute_static_features
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+VOCABULARY = [
+    'python', 'машинное', 'обучение', 'данные', 'модель', 'сервер', 'база', 'запрос',
+    'индекс', 'поиск', 'javascript', 'react', 'kubernetes', 'docker', 'сеть', 'нейронная',
+    'алгоритм', 'оптимизация', 'производительность', 'кэш', 'redis', 'postgresql', 'linux',
+    'архитектура', 'микросервисы', 'тестирование', 'разработка', 'frontend', 'backend', 'api'
+]
+
+
+def load_articles(limit: int) -> List[Dict[str, Any]]:
+
+    try:
+        from db_manager import DatabaseManager
+        articles = DatabaseManager().get_articles_for_search()[:limit]
+        return [dict(article, scraped_at=datetime.now()) for article in articles]
+    except Exception as e:
+        logger.warning(f"Статьи из PostgreSQL недоступны: {e}")
+        return []
+
+
+def make_articles(n: int, rng: random.Random) -> List[Dict[str, Any]]:
+
+    articles = []
+    for i in range(n):
+        text = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(500, 3000)))
+        title = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(3, 8)))
+        tags = [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 5))]
+        articles.append({
+            'id': i,
+            'habr_id': str(700000 + i),
+            'url': f"https://habr.com/ru/articles/{700000 + i}/",
+            'title': title,
+            'text_content': text,
+            'tags': tags,
+            'views': rng.randint(0, 100000),
+            'score': rng.randint(-10, 200),
+            'comments_count': rng.randint(0, 500),
+            **compute_static_features(title, text, tags),
+            'scraped_at': datetime.now()
+        })
+    return articles
+
+
+def make_payloads(articles: List[Dict[str, Any]], rng: random.Random) -> Dict[str, List[Any]]:
+
+    return {
+        'article_meta': articles,
+        'result_meta': [
+            {field: article.get(field) for field in ('title', 'url', 'views', 'comments_count', 'tags')}
+            for article in articles
+        ],
+        'ranked': [
+            {
+                'ids': [rng.randint(1, 900000) for _ in range(100)],
+                'scores': [rng.uniform(-3, 3) for _ in range(100)],
+                'bm25_scores': [rng.uniform(0, 40) for _ in range(100)],
+                'complete': True
+            }
+            for _ in range(max(1, len(articles)))
+        ]
+    }
+
+
+def legacy_json(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=lambda obj: obj.isoformat()).encode('utf-8')
+
+
+def measure(encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+            values: List[Any], repeats: int) -> Dict[str, float]:
+    
+    encoded = [encode(value) for value in values]
+    
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for value in values:
+            encode(value)
+    encode_time = (time.perf_counter() - start_time) / (repeats * len(values))
+    
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for data in encoded:
+            decode(data)
+    decode_time = (time.perf_counter() - start_time) / (repeats * len(values))
+    
+    return {
+        'bytes': sum(len(data) for data in encoded) / len(encoded),
+        'encode_us': encode_time * 1e6,
+        'decode_us': decode_time * 1e6
+    }
+
+
+def hash_bytes(codec: CacheCodec, article: Dict[str, Any], fields: tuple) -> int:
+
+    values = dict(article, text_prefix=(article.get('text_content') or '')[:TEXT_PREFIX_LENGTH])
+    return sum(len(field) + len(codec.encode(values.get(field))) for field in fields)
+
+
+def report_article_layout(articles: List[Dict[str, Any]], threshold: int, candidates: int):
+
+    codec = CacheCodec(compress_threshold=threshold)
+    layouts = {
+        'полная строка (json)': [len(legacy_json(article)) for article in articles],
+        'хэш: входы ранжирования': [hash_bytes(codec, article, ARTICLE_RANKING_FIELDS) for article in articles],
+        'хэш: поля отображения': [hash_bytes(codec, article, ARTICLE_DISPLAY_FIELDS) for article in articles],
+    }
+    baseline = sum(layouts['полная строка (json)']) / len(articles)
+    logger.info(f"Метаданные статьи в Redis ({codec.serializer}+{codec.compression}), {candidates} кандидатов на запрос:")
+    for name, sizes in layouts.items():
+        per_article = sum(sizes) / len(sizes)
+        logger.info(
+            f"  {name:>24}  байт/статья={per_article:>9.0f} ({per_article / baseline * 100:5.1f}%)  "
+            f"байт/запрос={per_article * candidates / 1024:8.1f}КБ"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Размер и скорость кодеков кэша Redis на статьях')
+    parser.add_argument('--articles', type=int, default=200, help='Сколько статей взять из PostgreSQL')
+    parser.add_argument('--synthetic', action='store_true', help='Не читать PostgreSQL, сгенерировать статьи')
+    parser.add_argument('--threshold', type=int, default=1024, help='Порог сжатия в байтах')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--candidates', type=int, default=100, help='Кандидатов на запрос для оценки трафика')
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    articles = [] if args.synthetic else load_articles(args.articles)
+    source = 'PostgreSQL'
+    if not articles:
+        articles = make_articles(args.articles, rng)
+        source = 'синтетика'
+    logger.info(f"Статей: {len(articles)} ({source}), доступные кодеки: {available_codecs()}")
+    
+    codecs = {'legacy json': (legacy_json, json.loads)}
+    codecs_available = available_codecs()
+    for serializer in codecs_available['serializers']:
+        for compression in codecs_available['compression']:
+            codec = CacheCodec(serializer, compression, compress_threshold=args.threshold)
+            codecs[f"{serializer}+{compression}"] = (codec.encode, codec.decode)
+    
+    report_article_layout(articles, args.threshold, args.candidates)
+    
+    for kind, values in make_payloads(articles, rng).items():
+        logger.info(f"{kind}:")
+        baseline = None
+        for name, (encode, decode) in codecs.items():
+            result = measure(encode, decode, values, args.repeats)
+            baseline = baseline or result['bytes']
+            logger.info(
+                f"  {name:>16}  байт={result['bytes']:>9.0f} ({result['bytes'] / baseline * 100:5.1f}%)  "
+                f"encode={result['encode_us']:8.1f}us  decode={result['decode_us']:8.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
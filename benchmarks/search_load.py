@@ -0,0 +1,93 @@
+import argparse
+import time
+import logging
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERIES = [
+    "машинное обучение",
+    "python разработка",
+    "javascript веб",
+    "база данных",
+    "искусственный интеллект",
+    "kubernetes",
+    "postgresql индексы",
+    "react хуки",
+]
+
+
+def run_worker(url: str, queries: List[str], requests_per_client: int, top_n: int) -> List[float]:
+
+    latencies = []
+    session = requests.Session()
+    for i in range(requests_per_client):
+        payload = {'query': queries[i % len(queries)], 'top_n': top_n}
+        start_time = time.perf_counter()
+        try:
+            response = session.post(url, json=payload, timeout=60)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start_time)
+        except Exception as e:
+            logger.warning(f"Ошибка запроса '{payload['query']}': {e}")
+    return latencies
+
+
+def run_load(url: str, clients: int, requests_per_client: int, top_n: int, queries: List[str]) -> dict:
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        futures = [
+            executor.submit(run_worker, url, queries[i:] + queries[:i], requests_per_client, top_n)
+            for i in range(clients)
+        ]
+        latencies = [latency for future in futures for latency in future.result()]
+    duration = time.perf_counter() - start_time
+
+    if not latencies:
+        return {'clients': clients, 'ok': 0, 'rps': 0.0}
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'ok': len(latencies),
+        'failed': clients * requests_per_client - len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест POST /api/search')
+    parser.add_argument('--url', type=str, default='http://localhost:8000/api/search')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50, 100],
+                        help='Количество параллельных клиентов (можно несколько значений)')
+    parser.add_argument('--requests', type=int, default=20, help='Запросов на клиента')
+    parser.add_argument('--top-n', type=int, default=10)
+
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        result = run_load(args.url, clients, args.requests, args.top_n, DEFAULT_QUERIES)
+        if not result['ok']:
+            logger.error(f"clients={clients}: ни один запрос не выполнен")
+            continue
+        logger.info(
+            f"clients={result['clients']:>4} ok={result['ok']:>5} failed={result['failed']:>3} "
+            f"rps={result['rps']:8.1f} p50={result['p50_ms']:7.1f}ms "
+            f"p95={result['p95_ms']:7.1f}ms p99={result['p99_ms']:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from cache_codec import JSON_ENCODER, CacheCodec, json_dumps
+from app.models import SearchRequest, SearchResponse, SearchResult
+from app.responses import FastJSONResponse, merge_json_object
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+VOCABULARY = [
+    'python', 'машинное', 'обучение', 'данные', 'модель', 'сервер', 'база', 'запрос',
+    'индекс', 'поиск', 'javascript', 'react', 'kubernetes', 'docker', 'сеть', 'нейронная'
+]
+
+
+def make_page(top_n: int, rng: random.Random) -> Dict[str, Any]:
+
+    results = []
+    for i in range(top_n):
+        score = rng.uniform(-3, 3)
+        results.append({
+            'id': 700000 + i,
+            'title': ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(4, 10))),
+            'url': f"https://habr.com/ru/articles/{700000 + i}/",
+            'score': score,
+            'ml_score': score,
+            'bm25_score': rng.uniform(0, 40),
+            'views': rng.randint(0, 100000),
+            'comments_count': rng.randint(0, 500),
+            'tags': [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 5))]
+        })
+    return {'results': results, 'offset': 0, 'next_cursor': 'eyJxIjoiMDAwMDAwMDAiLCJvIjoxMH0'}
+
+
+def make_app(page: Dict[str, Any]) -> FastAPI:
+
+    # попадание в кэш для каждого варианта: страница уже лежит в памяти в том виде, в каком ее отдает кэш
+    codec = CacheCodec()
+    encoded_page = codec.encode(page)
+    page_bytes = json_dumps({**page, 'total_results': len(page['results'])})
+    app = FastAPI()
+
+    @app.post("/pydantic", response_model=SearchResponse, response_class=JSONResponse)
+    async def pydantic_path(request: SearchRequest):
+        start_time = time.time()
+        cached = codec.decode(encoded_page)
+        results = [SearchResult(**result) for result in cached['results']]
+        return SearchResponse(
+            query=request.query,
+            results=results,
+            total_results=len(results),
+            search_time=time.time() - start_time,
+            offset=cached['offset'],
+            next_cursor=cached['next_cursor']
+        )
+
+    @app.post("/orjson", response_model=SearchResponse)
+    async def orjson_path(request: SearchRequest):
+        start_time = time.time()
+        cached = codec.decode(encoded_page)
+        return FastJSONResponse({
+            'query': request.query,
+            **cached,
+            'total_results': len(cached['results']),
+            'search_time': time.time() - start_time
+        })
+
+    @app.post("/bytes", response_model=SearchResponse)
+    async def bytes_path(request: SearchRequest):
+        start_time = time.time()
+        return FastJSONResponse(merge_json_object(
+            {'query': request.query, 'search_time': time.time() - start_time}, page_bytes
+        ))
+
+    return app
+
+
+async def call(app: FastAPI, path: str, body: bytes) -> bytes:
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        'client': ('127.0.0.1', 1), 'server': ('127.0.0.1', 80)
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    chunks = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return b''.join(chunks)
+
+
+async def bench_in_process(top_n: int, requests: int) -> Dict[str, float]:
+
+    app = make_app(make_page(top_n, random.Random(42)))
+    body = json.dumps({'query': 'машинное обучение', 'top_n': top_n}).encode('utf-8')
+
+    reference = None
+    results = {}
+    for path in ('/pydantic', '/orjson', '/bytes'):
+        response = json.loads(await call(app, path, body))
+        response.pop('search_time')
+        if reference is None:
+            reference = response
+        elif response != reference:
+            raise AssertionError(f"{path}: ответ отличается от /pydantic")
+
+        for _ in range(min(requests // 10, 200)):
+            await call(app, path, body)
+        start_time = time.perf_counter()
+        for _ in range(requests):
+            await call(app, path, body)
+        results[path.strip('/')] = requests / (time.perf_counter() - start_time)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Скорость ответа POST /api/search на попаданиях в кэш')
+    parser.add_argument('--top-n', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--requests', type=int, default=5000, help='Запросов на вариант')
+    parser.add_argument('--url', type=str, default=None,
+                        help='Живой API: повторяет запросы (попадания в кэш) через benchmarks/search_load.py, '
+                             'сравните прогоны с SEARCH_RESPONSE_CACHE=false и true')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50])
+    args = parser.parse_args()
+
+    logger.info(f"JSON кодировщик: {JSON_ENCODER}")
+    if args.url:
+        from search_load import DEFAULT_QUERIES, run_load
+        for top_n in args.top_n:
+            for clients in args.clients:
+                # прогрев: каждый запрос один раз, дальше все обращения - попадания
+                run_load(args.url, 1, len(DEFAULT_QUERIES), top_n, DEFAULT_QUERIES)
+                result = run_load(args.url, clients, args.requests // clients, top_n, DEFAULT_QUERIES)
+                logger.info(
+                    f"top_n={top_n:>3} clients={clients:>4} rps={result['rps']:8.1f} "
+                    f"p50={result.get('p50_ms', 0):7.2f}ms p99={result.get('p99_ms', 0):7.2f}ms"
+                )
+        return
+
+    for top_n in args.top_n:
+        results = asyncio.run(bench_in_process(top_n, args.requests))
+        baseline = results['pydantic']
+        logger.info(
+            f"top_n={top_n:>3}  " + "  ".join(
+                f"{name}={rps:8.0f} req/s (x{rps / baseline:.2f})" for name, rps in results.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ function App() {
     results, 
     comparisonResults, 
     loading: searchLoading, 
+    reranking,
     error: searchError,
     search,
     hasResults
@@ -57,6 +58,7 @@ function App() {
             query={query}
             results={results}
             loading={searchLoading}
+            reranking={reranking}
           />
         )}
 
@@ -45,9 +45,19 @@ const ArticleCard = ({
               {article.title}
             </a>
           </h3>
-          <span className={`${variantClasses.badge} text-xs font-medium px-2.5 py-0.5 rounded-full`}>
-            {variantClasses.label ? `${variantClasses.label} #${index + 1}` : `#${index + 1}`}
-          </span>
+          <div className="flex items-center space-x-2">
+            {variant === 'ml' && article.rank_delta !== undefined && article.rank_delta !== 0 && (
+              <span
+                className={`text-xs font-medium ${article.rank_delta > 0 ? 'text-green-600' : 'text-red-600'}`}
+                title={`BM25 #${article.bm25_rank}`}
+              >
+                {article.rank_delta > 0 ? `↑${article.rank_delta}` : `↓${-article.rank_delta}`}
+              </span>
+            )}
+            <span className={`${variantClasses.badge} text-xs font-medium px-2.5 py-0.5 rounded-full`}>
+              {variantClasses.label ? `${variantClasses.label} #${index + 1}` : `#${index + 1}`}
+            </span>
+          </div>
         </div>
         
         <div className={`flex items-center space-x-6 text-sm text-gray-600 mb-4 ${!showFullStats && 'text-xs space-x-4'}`}>
@@ -15,7 +15,7 @@ const ComparisonResults = ({ query, comparisonResults, loading }) => {
     return null;
   }
 
-  const { ml, bm25 } = comparisonResults;
+  const { ml, bm25, overlap } = comparisonResults;
 
   return (
     <div className="space-y-6">
@@ -25,6 +25,7 @@ const ComparisonResults = ({ query, comparisonResults, loading }) => {
         </h2>
         <span className="text-gray-600">
           ML: {ml?.length || 0} | BM25: {bm25?.length || 0} статей
+          {overlap !== undefined && ` | Совпадает: ${overlap}`}
         </span>
       </div>
       
@@ -1,7 +1,7 @@
 import React from 'react';
 import ArticleCard from './ArticleCard';
 
-const SearchResults = ({ query, results, loading }) => {
+const SearchResults = ({ query, results, loading, reranking = false }) => {
   if (loading) {
     return (
       <div className="text-center py-16">
@@ -22,7 +22,7 @@ const SearchResults = ({ query, results, loading }) => {
           Результаты поиска для "{query}"
         </h2>
         <span className="text-gray-600">
-          Найдено: {results.length} статей
+          {reranking ? 'Уточняем порядок… ' : ''}Найдено: {results.length} статей
         </span>
       </div>
       
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import ApiService from '../services/api';
 
 export const useSearch = () => {
@@ -6,10 +6,13 @@ export const useSearch = () => {
   const [results, setResults] = useState([]);
   const [comparisonResults, setComparisonResults] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [reranking, setReranking] = useState(false);
   const [error, setError] = useState(null);
+  const latestSearch = useRef(0);
 
   const search = async (searchQuery, compareMode = false) => {
     if (!searchQuery?.trim()) return;
+    const searchId = ++latestSearch.current;
 
     try {
       setLoading(true);
@@ -18,20 +21,32 @@ export const useSearch = () => {
 
       if (compareMode) {
         const data = await ApiService.compareSearch(searchQuery, 10);
+        if (searchId !== latestSearch.current) return;
         setComparisonResults(data);
         setResults([]);
       } else {
-        const data = await ApiService.search(searchQuery, 10, false);
-        setResults(data.results);
         setComparisonResults(null);
+        // BM25 выдача показывается сразу, ML порядок переставляет те же карточки, когда будет готов
+        await ApiService.searchStream(searchQuery, 10, (event) => {
+          // события предыдущего поиска не должны перезаписать выдачу нового
+          if (searchId !== latestSearch.current) return;
+          setResults(event.results);
+          setReranking(!event.final);
+          setLoading(false);
+        });
       }
     } catch (err) {
+      console.error('Search error:', err);
+      if (searchId !== latestSearch.current) return;
       setError('Ошибка при выполнении поиска');
       setResults([]);
       setComparisonResults(null);
-      console.error('Search error:', err);
     } finally {
-      setLoading(false);
+      // более новый поиск сам сбросит индикаторы, когда завершится
+      if (searchId === latestSearch.current) {
+        setLoading(false);
+        setReranking(false);
+      }
     }
   };
 
@@ -47,6 +62,7 @@ export const useSearch = () => {
     results,
     comparisonResults,
     loading,
+    reranking,
     error,
     search,
     clearResults,
@@ -29,17 +29,58 @@ class ApiService {
     }
   }
 
-  async compareSearch(query, limit = 10) {
+  async searchStream(query, limit = 10, onEvent) {
     try {
-      const [mlResponse, bm25Response] = await Promise.all([
-        this.search(query, limit, false), 
-        this.search(query, limit, true)   
-      ]);
-      
-      return {
-        ml: mlResponse.results,
-        bm25: bm25Response.results
+      // axios в браузере не отдает тело по частям, поэтому NDJSON читаем через fetch
+      const response = await fetch(`${BASE_URL}/search/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ query: query.trim(), top_n: limit })
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let lastEvent = null;
+
+      const handleLine = (line) => {
+        if (!line.trim()) return;
+        const event = JSON.parse(line);
+        if (event.stage === 'error') {
+          throw new Error(event.detail);
+        }
+        lastEvent = event;
+        onEvent(event);
       };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+      }
+      handleLine(buffer + decoder.decode());
+
+      return lastEvent;
+    } catch (error) {
+      console.error('Ошибка потокового поиска:', error);
+      throw error;
+    }
+  }
+
+  async compareSearch(query, limit = 10) {
+    try {
+      // один запрос: обе выдачи считаются из одного набора кандидатов
+      const response = await axios.post(`${BASE_URL}/compare`, {
+        query: query.trim(),
+        top_n: limit
+      });
+      return response.data;
     } catch (error) {
       console.error('Ошибка сравнительного поиска:', error);
       throw error;
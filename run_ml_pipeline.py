@@ -110,6 +110,15 @@ def run_ml_pipeline():
         logger.error("Признаки не были созданы")
         return False
     
+    success = run_command(
+        "python tfidf_store.py",
+        "Векторизация документов (TF-IDF матрица для API)",
+        cwd=src_dir
+    )
+    if not success:
+        logger.error("Ошибка на этапе векторизации документов")
+        return False
+    
     success = run_command(
         "python train.py",
         "Обучение LGBMRanker модели",
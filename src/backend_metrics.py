@@ -0,0 +1,16 @@
+# менеджеры работают и в API, и в Airflow; метрики есть только там, где установлен prometheus_client
+try:
+    from prometheus_client import Counter
+except ImportError:
+    Counter = None
+
+BACKEND_ERRORS = Counter(
+    'search_backend_errors_total', 'Ошибки обращений к Elasticsearch, PostgreSQL и Redis',
+    ['backend', 'operation']
+) if Counter is not None else None
+
+
+def record_backend_error(backend: str, operation: str, count: int = 1):
+
+    if BACKEND_ERRORS is not None:
+        BACKEND_ERRORS.labels(backend, operation).inc(count)
@@ -0,0 +1,167 @@
+import os
+import json
+import zlib
+import logging
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# первый байт значения - формат (сериализатор + сжатие); байты < 0x20 не встречаются в начале JSON,
+# поэтому значения, записанные до появления кодеков, читаются как обычный JSON
+FORMATS: Dict[int, Tuple[str, str]] = {
+    0x01: ('json', 'none'),
+    0x02: ('json', 'zlib'),
+    0x03: ('json', 'zstd'),
+    0x04: ('json', 'lz4'),
+    0x05: ('msgpack', 'none'),
+    0x06: ('msgpack', 'zlib'),
+    0x07: ('msgpack', 'zstd'),
+    0x08: ('msgpack', 'lz4'),
+}
+_FORMAT_IDS = {codec: format_id for format_id, codec in FORMATS.items()}
+JSON_ENCODER = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj):
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj)} is not serializable")
+
+
+def json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+_SERIALIZERS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    'json': (json_dumps, json_loads),
+    'msgpack': (_msgpack_dumps, _msgpack_loads),
+}
+
+
+def _compressors(level: int) -> Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+
+    compressors = {
+        'none': (lambda data: data, lambda data: data),
+        'zlib': (lambda data: zlib.compress(data, min(level, 9)), zlib.decompress),
+    }
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=level)
+        decompressor = zstandard.ZstdDecompressor()
+        compressors['zstd'] = (compressor.compress, decompressor.decompress)
+    if lz4_frame is not None:
+        compressors['lz4'] = (lz4_frame.compress, lz4_frame.decompress)
+    return compressors
+
+
+def available_codecs() -> Dict[str, list]:
+
+    return {
+        'serializers': [name for name in _SERIALIZERS if name != 'msgpack' or msgpack is not None],
+        'compression': list(_compressors(3)),
+        'json_encoder': JSON_ENCODER
+    }
+
+
+class CacheCodec:
+
+    def __init__(self, serializer: str = None, compression: str = None,
+                 compress_threshold: int = None, level: int = None):
+        
+        if serializer is None:
+            serializer = os.getenv('CACHE_SERIALIZER', 'auto')
+        if compression is None:
+            compression = os.getenv('CACHE_COMPRESSION', 'auto')
+        if compress_threshold is None:
+            compress_threshold = int(os.getenv('CACHE_COMPRESS_THRESHOLD', '1024'))
+        if level is None:
+            level = int(os.getenv('CACHE_COMPRESSION_LEVEL', '3'))
+        
+        self._compressors = _compressors(level)
+        
+        if serializer == 'auto':
+            serializer = 'msgpack' if msgpack is not None else 'json'
+        elif serializer not in _SERIALIZERS:
+            raise ValueError(f"Неизвестный сериализатор кэша: {serializer}")
+        elif serializer == 'msgpack' and msgpack is None:
+            logger.warning("msgpack не установлен, кэш сериализуется в JSON")
+            serializer = 'json'
+        
+        if compression == 'auto':
+            compression = next(name for name in ('zstd', 'lz4', 'zlib') if name in self._compressors)
+        elif compression not in ('none', 'zlib', 'zstd', 'lz4'):
+            raise ValueError(f"Неизвестное сжатие кэша: {compression}")
+        elif compression not in self._compressors:
+            logger.warning(f"{compression} не установлен, кэш сжимается zlib")
+            compression = 'zlib'
+        
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self._dumps = _SERIALIZERS[serializer][0]
+        self._compress = self._compressors[compression][0]
+    
+    def encode(self, value: Any) -> bytes:
+
+        data = self._dumps(value)
+        compression = 'none'
+        if self.compression != 'none' and len(data) >= self.compress_threshold:
+            compressed = self._compress(data)
+            # несжимаемые данные храним как есть, чтобы не платить за распаковку
+            if len(compressed) < len(data):
+                data, compression = compressed, self.compression
+        return bytes((_FORMAT_IDS[(self.serializer, compression)],)) + data
+    
+    def decode(self, data: bytes) -> Any:
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        
+        codec = FORMATS.get(data[0]) if data else None
+        if codec is None:
+            return json_loads(data)
+        
+        serializer, compression = codec
+        if serializer == 'msgpack' and msgpack is None:
+            raise ValueError("Значение записано в msgpack, но msgpack не установлен")
+        if compression not in self._compressors:
+            raise ValueError(f"Значение сжато {compression}, но библиотека не установлена")
+        
+        return _SERIALIZERS[serializer][1](self._compressors[compression][1](data[1:]))
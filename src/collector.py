@@ -7,6 +7,7 @@ from tqdm import tqdm
 from bs4 import BeautifulSoup
 import re
 from elasticsearch_manager import ElasticsearchManager
+from document_features import compute_static_features
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -183,13 +184,15 @@ class HabrDataCollector:
             
             return {
                 'id': article_id,
+                'habr_id': article_id,
                 'url': url,
                 'title': title,
                 'text_content': text_content,
                 'tags': tags,
                 'views': views,
                 'score': score,
-                'comments_count': comments_count
+                'comments_count': comments_count,
+                **compute_static_features(title, text_content, tags)
             }
             
         except Exception as e:
@@ -6,6 +6,7 @@ import pandas as pd
 import numpy as np
 import hashlib
 from db_manager import DatabaseManager
+from document_features import STATIC_FEATURE_COLUMNS
 import logging
 from tqdm import tqdm
 
@@ -103,7 +104,8 @@ class DatasetCreator:
                     'comments_count': article_data['comments_count'],
                     'title': article_data['title'],
                     'text_content': article_data['text_content'],
-                    'tags': article_data['tags']
+                    'tags': article_data['tags'],
+                    **{column: article_data[column] for column in STATIC_FEATURE_COLUMNS if column in article_data}
                 })
         
         pairs_df = pd.DataFrame(pairs)
@@ -125,7 +127,8 @@ class DatasetCreator:
         try:
             with self.db_manager.get_connection() as conn:
                 articles_df = pd.read_sql_query("""
-                    SELECT id, title, text_content, tags, views, score, comments_count, scraped_at
+                    SELECT id, title, text_content, tags, views, score, comments_count, scraped_at,
+                           word_count, has_code, has_images, title_length, tags_count
                     FROM articles 
                     WHERE text_content IS NOT NULL 
                       AND text_content != '' 
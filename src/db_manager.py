@@ -1,28 +1,136 @@
 import os
+import json
+import time
+import base64
+import asyncio
+import threading
 import psycopg2
+import psycopg2.extensions
 import logging
-from typing import List, Dict, Any
-from psycopg2.extras import RealDictCursor
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+from psycopg2.extras import RealDictCursor, execute_values
 from tqdm import tqdm
+from backend_metrics import record_backend_error
+from document_features import STATIC_FEATURE_COLUMNS, compute_static_features, ensure_static_features
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DatabaseManager:
+def _default_db_config() -> Dict[str, str]:
+
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5433'),
+        'database': os.getenv('DB_NAME', 'habr_articles_db'),
+        'user': os.getenv('DB_USER', 'habr_user'),
+        'password': os.getenv('DB_PASSWORD', 'habr_pass')
+    }
+
+def _database_stats(totals, hubs) -> Dict[str, Any]:
+
+    return {
+        'total_articles': int(totals['total_articles']),
+        'total_views': int(totals['total_views']),
+        'avg_views': float(totals['avg_views']),
+        'top_hubs': [{'hub': hub['hub'], 'count': int(hub['count'])} for hub in hubs]
+    }
+
+
+# проекция для списков статей: без text_content, тело статьи в выдачу не попадает
+ARTICLE_SUMMARY_COLUMNS = "id, url, title, tags, views, score, comments_count"
+
+KeysetCursor = Tuple[int, int, int]
+
+ASYNC_POOL_HEALTHCHECK_TIMEOUT = 5.0
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(article: Dict[str, Any]) -> str:
+
+    payload = json.dumps([article['views'], article['score'], article['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> KeysetCursor:
+
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        views, score, article_id = json.loads(payload)
+        return int(views), int(score), int(article_id)
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"Некорректный курсор: {cursor}") from e
+
+
+def _article_page_query(placeholder, limit: int, hub: str = None,
+                        after: KeysetCursor = None) -> Tuple[str, list]:
     
-    def __init__(self, db_config: Dict[str, str] = None):
+    conditions, params = [], []
+    if hub is not None:
+        params.append(hub)
+        conditions.append(f"tags @> ARRAY[{placeholder(len(params))}]::text[]")
+    if after is not None:
+        params.extend(after)
+        conditions.append(
+            f"(views, score, id) < ({placeholder(len(params) - 2)}, "
+            f"{placeholder(len(params) - 1)}, {placeholder(len(params))})"
+        )
+    # лишняя строка показывает, есть ли следующая страница
+    params.append(limit + 1)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {ARTICLE_SUMMARY_COLUMNS}
+        FROM articles
+        {where}
+        ORDER BY views DESC, score DESC, id DESC
+        LIMIT {placeholder(len(params))}
+    """
+    return query, params
+
+
+def _article_page(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+
+    articles = rows[:limit]
+    return {
+        'articles': articles,
+        'next_cursor': encode_cursor(articles[-1]) if len(rows) > limit else None
+    }
+
+
+def extract_habr_id(url: str) -> str:
+
+    return url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]
+
+class ConnectionPool:
+    
+    def __init__(self, db_config: Dict[str, str], min_size: int = None, max_size: int = None,
+                 health_check_interval: float = None):
 
-        if db_config is None:
-            db_config = {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'port': os.getenv('DB_PORT', '5433'),
-                'database': os.getenv('DB_NAME', 'habr_articles_db'),
-                'user': os.getenv('DB_USER', 'habr_user'),
-                'password': os.getenv('DB_PASSWORD', 'habr_pass')
-            }
         self.db_config = db_config
+        self.min_size = min_size if min_size is not None else int(os.getenv('DB_POOL_MIN', '1'))
+        self.max_size = max_size or int(os.getenv('DB_POOL_MAX', '10'))
+        self.health_check_interval = health_check_interval if health_check_interval is not None \
+            else float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+        
+        self._idle = deque()
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._warmed_up = False
+        
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._health_check_failures = 0
     
-    def get_connection(self):
+    def _connect(self):
 
         return psycopg2.connect(
             host=self.db_config['host'],
@@ -32,6 +140,186 @@ class DatabaseManager:
             password=self.db_config['password']
         )
     
+    def _warm_up(self):
+
+        with self._lock:
+            if self._warmed_up:
+                return
+            self._warmed_up = True
+        
+        for _ in range(max(0, self.min_size - 1)):
+            try:
+                conn = self._connect()
+            except Exception as e:
+                logger.warning(f"Не удалось прогреть пул соединений: {e}")
+                break
+            with self._lock:
+                self._idle.append(conn)
+                self._last_used[id(conn)] = time.monotonic()
+        logger.info(f"Пул соединений с БД создан (min={self.min_size}, max={self.max_size})")
+    
+    def _is_healthy(self, conn) -> bool:
+
+        if conn.closed:
+            return False
+        
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+    
+    def _discard(self, conn):
+
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _checkout(self):
+
+        start_time = time.perf_counter()
+        
+        with self._lock:
+            self._waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self._waiting -= 1
+        
+        try:
+            if not self._warmed_up:
+                self._warm_up()
+            
+            conn = None
+            while conn is None:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    conn = self._connect()
+                elif not self._is_healthy(conn):
+                    logger.warning("Соединение из пула не прошло проверку, переподключаемся")
+                    with self._lock:
+                        self._health_check_failures += 1
+                    self._discard(conn)
+                    conn = None
+        except Exception:
+            self._slots.release()
+            raise
+        
+        checkout_time = time.perf_counter() - start_time
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._checkout_time_total += checkout_time
+            self._checkout_time_max = max(self._checkout_time_max, checkout_time)
+        
+        return conn
+    
+    def _release(self, conn, discard: bool = False):
+
+        try:
+            if discard or conn.closed or \
+               conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._last_used[id(conn)] = time.monotonic()
+                    self._idle.append(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+    
+    @contextmanager
+    def connection(self):
+
+        conn = self._checkout()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self._release(conn, discard)
+    
+    def get_stats(self) -> Dict[str, Any]:
+
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'avg_checkout_ms': self._checkout_time_total / checkouts * 1000 if checkouts else 0.0,
+                'max_checkout_ms': self._checkout_time_max * 1000,
+                'health_check_failures': self._health_check_failures
+            }
+    
+    def close(self):
+
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._warmed_up = False
+        for conn in idle:
+            self._discard(conn)
+
+
+_connection_pools: Dict[tuple, ConnectionPool] = {}
+_connection_pools_lock = threading.Lock()
+
+def get_connection_pool(db_config: Dict[str, str]) -> ConnectionPool:
+
+    # пул привязан к процессу: после fork (Airflow, uvicorn workers) создается новый
+    key = (os.getpid(),) + tuple(sorted((k, str(v)) for k, v in db_config.items()))
+    with _connection_pools_lock:
+        pool = _connection_pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_config)
+            _connection_pools[key] = pool
+        return pool
+
+def close_connection_pools():
+
+    pid = os.getpid()
+    with _connection_pools_lock:
+        for key, pool in list(_connection_pools.items()):
+            if key[0] == pid:
+                pool.close()
+                del _connection_pools[key]
+
+class DatabaseManager:
+    
+    def __init__(self, db_config: Dict[str, str] = None):
+
+        if db_config is None:
+            db_config = _default_db_config()
+        self.db_config = db_config
+        self.pool = get_connection_pool(db_config)
+    
+    def get_connection(self):
+
+        return self.pool.connection()
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+
+        return self.pool.get_stats()
+    
     def test_connection(self) -> bool:
 
         try:
@@ -58,24 +346,37 @@ class DatabaseManager:
                     for article in tqdm(articles, desc="Сохранение статей в БД"):
                         try:
                             insert_query = """
-                                INSERT INTO articles (url, title, text_content, tags, views, score, comments_count)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                                ON CONFLICT (url) DO UPDATE SET
+                                INSERT INTO articles (habr_id, url, title, text_content, tags, views, score, comments_count,
+                                                      word_count, has_code, has_images, title_length, tags_count)
+                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                                ON CONFLICT (habr_id) DO UPDATE SET
                                     views = EXCLUDED.views,
                                     score = EXCLUDED.score,
                                     comments_count = EXCLUDED.comments_count,
+                                    word_count = COALESCE(articles.word_count, EXCLUDED.word_count),
+                                    has_code = COALESCE(articles.has_code, EXCLUDED.has_code),
+                                    has_images = COALESCE(articles.has_images, EXCLUDED.has_images),
+                                    title_length = COALESCE(articles.title_length, EXCLUDED.title_length),
+                                    tags_count = COALESCE(articles.tags_count, EXCLUDED.tags_count),
                                     scraped_at = CURRENT_TIMESTAMP
                                 RETURNING id
                             """
                             
+                            ensure_static_features(article)
                             cursor.execute(insert_query, (
+                                article.get('habr_id') or extract_habr_id(article['url']),
                                 article['url'],
                                 article['title'],
                                 article['text_content'],
                                 article['tags'],
                                 article['views'],
                                 article['score'],
-                                article['comments_count']
+                                article['comments_count'],
+                                article['word_count'],
+                                article['has_code'],
+                                article['has_images'],
+                                article['title_length'],
+                                article['tags_count']
                             ))
                             
                             result = cursor.fetchone()
@@ -95,6 +396,89 @@ class DatabaseManager:
         logger.info(f"Успешно обработано {saved_count} статей из {len(articles)} (новые + обновленные)")
         return saved_count
     
+    def apply_migrations(self, migrations_dir: str = None) -> List[str]:
+
+        if migrations_dir is None:
+            migrations_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+        
+        migration_files = sorted(f for f in os.listdir(migrations_dir) if f.endswith('.sql'))
+        applied = []
+        
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        name TEXT PRIMARY KEY,
+                        applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute("SELECT name FROM schema_migrations")
+                already_applied = {row[0] for row in cursor.fetchall()}
+        
+        for migration_file in migration_files:
+            if migration_file in already_applied:
+                continue
+            
+            with open(os.path.join(migrations_dir, migration_file), 'r', encoding='utf-8') as f:
+                migration_sql = f.read()
+            
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(migration_sql)
+                    cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (migration_file,))
+            
+            logger.info(f"Миграция применена: {migration_file}")
+            applied.append(migration_file)
+        
+        return applied
+    
+    def backfill_static_features(self, batch_size: int = 500) -> int:
+
+        select_query = f"""
+            SELECT id, title, text_content, tags
+            FROM articles
+            WHERE {' OR '.join(f'{column} IS NULL' for column in STATIC_FEATURE_COLUMNS)}
+            ORDER BY id
+            LIMIT %s
+        """
+        update_query = """
+            UPDATE articles SET
+                word_count = data.word_count,
+                has_code = data.has_code,
+                has_images = data.has_images,
+                title_length = data.title_length,
+                tags_count = data.tags_count
+            FROM (VALUES %s) AS data (id, word_count, has_code, has_images, title_length, tags_count)
+            WHERE articles.id = data.id
+        """
+        
+        updated = 0
+        try:
+            while True:
+                with self.get_connection() as conn:
+                    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                        cursor.execute(select_query, (batch_size,))
+                        rows = cursor.fetchall()
+                        if not rows:
+                            break
+                        
+                        values = []
+                        for row in rows:
+                            features = compute_static_features(row['title'], row['text_content'], row['tags'])
+                            values.append((row['id'], *(features[column] for column in STATIC_FEATURE_COLUMNS)))
+                        execute_values(cursor, update_query, values, page_size=batch_size)
+                        updated += len(values)
+                
+                if len(rows) < batch_size:
+                    break
+            
+            if updated:
+                logger.info(f"Статические признаки заполнены для {updated} статей")
+            return updated
+        except Exception as e:
+            logger.error(f"Ошибка при заполнении статических признаков: {e}")
+            raise
+    
     def get_articles_count(self) -> int:
 
         try:
@@ -105,15 +489,54 @@ class DatabaseManager:
                     return result[0] if result else 0
         except Exception as e:
             logger.error(f"Ошибка при получении количества статей: {e}")
+            record_backend_error('postgres', 'get_articles_count')
             return 0
     
+    def refresh_hub_stats(self):
+
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    # CONCURRENTLY не блокирует чтение статистики на время обновления
+                    cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY hub_stats")
+            logger.info("Статистика хабов обновлена")
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статистики хабов: {e}")
+            raise
+    
+    def get_database_stats(self, top_hubs: int = 10) -> Optional[Dict[str, Any]]:
+
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT COUNT(*) AS total_articles,
+                               COALESCE(SUM(views), 0) AS total_views,
+                               COALESCE(AVG(views), 0) AS avg_views
+                        FROM articles
+                    """)
+                    totals = cursor.fetchone()
+                    cursor.execute("""
+                        SELECT hub, articles_count AS count
+                        FROM hub_stats
+                        ORDER BY articles_count DESC, hub
+                        LIMIT %s
+                    """, (top_hubs,))
+                    hubs = cursor.fetchall()
+            return _database_stats(totals, hubs)
+        except Exception as e:
+            logger.error(f"Ошибка при получении статистики базы данных: {e}")
+            record_backend_error('postgres', 'get_database_stats')
+            return None
+    
     def get_articles_for_search(self) -> List[Dict[str, Any]]:
 
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute("""
-                        SELECT id, url, title, text_content, tags, views, score, comments_count
+                        SELECT id, habr_id, url, title, text_content, tags, views, score, comments_count,
+                               word_count, has_code, has_images, title_length, tags_count
                         FROM articles
                         ORDER BY scraped_at DESC
                     """)
@@ -142,33 +565,55 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute("""
-                        SELECT id, url, title, text_content, tags, views, score, comments_count, scraped_at
+                        SELECT id, habr_id, url, title, text_content, tags, views, score, comments_count,
+                               word_count, has_code, has_images, title_length, tags_count, scraped_at
                         FROM articles
-                        WHERE url LIKE %s
-                    """, (f'%{habr_id}%',))
+                        WHERE habr_id = %s
+                    """, (str(habr_id),))
                     return cursor.fetchone()
         except Exception as e:
             logger.error(f"Ошибка при получении статьи с Habr ID {habr_id}: {e}")
             return None
     
-    def search_articles_by_title(self, search_term: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_articles_by_ids(self, article_ids: List[int]) -> List[Dict[str, Any]]:
 
+        if not article_ids:
+            return []
+        
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                     cursor.execute("""
-                        SELECT id, url, title, text_content, tags, views, score, comments_count
+                        SELECT id, url, title, text_content, tags, views, score, comments_count, scraped_at
                         FROM articles
-                        WHERE title ILIKE %s
-                        ORDER BY views DESC, score DESC
-                        LIMIT %s
-                    """, (f'%{search_term}%', limit))
+                        WHERE id = ANY(%s)
+                    """, (list(article_ids),))
                     return cursor.fetchall()
         except Exception as e:
-            logger.error(f"Ошибка при поиске статей: {e}")
+            logger.error(f"Ошибка при получении статей {len(article_ids)} ID: {e}")
             return []
     
-    def get_top_articles(self, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_articles_by_habr_ids(self, habr_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+
+        if not habr_ids:
+            return {}
+        
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT id, habr_id, url, title, text_content, tags, views, score, comments_count,
+                               word_count, has_code, has_images, title_length, tags_count, scraped_at
+                        FROM articles
+                        WHERE habr_id = ANY(%s)
+                    """, ([str(habr_id) for habr_id in habr_ids],))
+                    return {row['habr_id']: row for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Ошибка при получении статей по {len(habr_ids)} Habr ID: {e}")
+            record_backend_error('postgres', 'get_articles_by_habr_ids')
+            return {}
+    
+    def search_articles_by_title(self, search_term: str, limit: int = 10) -> List[Dict[str, Any]]:
 
         try:
             with self.get_connection() as conn:
@@ -176,13 +621,325 @@ class DatabaseManager:
                     cursor.execute("""
                         SELECT id, url, title, text_content, tags, views, score, comments_count
                         FROM articles
+                        WHERE title ILIKE %s
                         ORDER BY views DESC, score DESC
                         LIMIT %s
-                    """, (limit,))
+                    """, (f'%{search_term}%', limit))
                     return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Ошибка при поиске статей: {e}")
+            return []
+    
+    def _get_article_page(self, limit: int, hub: str = None, after: KeysetCursor = None) -> Dict[str, Any]:
+
+        query, params = _article_page_query(lambda i: '%s', limit, hub, after)
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(query, params)
+                return _article_page(cursor.fetchall(), limit)
+    
+    def get_top_articles(self, limit: int = 10, after: KeysetCursor = None) -> Dict[str, Any]:
+
+        try:
+            return self._get_article_page(limit, after=after)
         except Exception as e:
             logger.error(f"Ошибка при получении топ статей: {e}")
+            record_backend_error('postgres', 'get_top_articles')
+            return _article_page([], limit)
+    
+    def get_articles_by_hub(self, hub: str, limit: int = 20, after: KeysetCursor = None) -> Dict[str, Any]:
+
+        try:
+            return self._get_article_page(limit, hub=hub, after=after)
+        except Exception as e:
+            logger.error(f"Ошибка при получении статей хаба {hub}: {e}")
+            record_backend_error('postgres', 'get_articles_by_hub')
+            return _article_page([], limit)
+
+
+class AsyncDatabaseManager:
+    
+    def __init__(self, db_config: Dict[str, str] = None, min_size: int = None, max_size: int = None):
+
+        if db_config is None:
+            db_config = _default_db_config()
+        self.db_config = db_config
+        self.min_size = min_size or int(os.getenv('DB_ASYNC_POOL_MIN', '2'))
+        self.max_size = max_size or int(os.getenv('DB_ASYNC_POOL_MAX', '10'))
+        self.health_check_interval = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        
+        # по PID серверного процесса: прокси asyncpg на каждый acquire новый, соединение под ним то же
+        self._last_used = {}
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._health_check_failures = 0
+    
+    async def get_pool(self):
+
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    import asyncpg
+                    self._pool = await asyncpg.create_pool(
+                        host=self.db_config['host'],
+                        port=int(self.db_config['port']),
+                        database=self.db_config['database'],
+                        user=self.db_config['user'],
+                        password=self.db_config['password'],
+                        min_size=self.min_size,
+                        max_size=self.max_size
+                    )
+        return self._pool
+    
+    async def _is_healthy(self, conn) -> bool:
+
+        if conn.is_closed():
+            return False
+        
+        last_used = self._last_used.get(conn.get_server_pid())
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        
+        try:
+            return await conn.fetchval("SELECT 1", timeout=ASYNC_POOL_HEALTHCHECK_TIMEOUT) == 1
+        except Exception:
+            return False
+    
+    async def _checkout(self, pool):
+
+        while True:
+            conn = await pool.acquire()
+            try:
+                healthy = await self._is_healthy(conn)
+            except BaseException:
+                # отмена посреди SELECT 1 (клиент отключился): состояние соединения неизвестно,
+                # закрываем его и возвращаем слот в пул
+                conn.terminate()
+                await pool.release(conn)
+                raise
+            if healthy:
+                return conn
+            logger.warning("Соединение из пула не прошло проверку, переподключаемся")
+            self._health_check_failures += 1
+            self._last_used.pop(conn.get_server_pid(), None)
+            # закрытое соединение пул пересоздает при следующем acquire
+            conn.terminate()
+            await pool.release(conn)
+    
+    @asynccontextmanager
+    async def acquire(self):
+
+        pool = await self.get_pool()
+        start_time = time.perf_counter()
+        
+        self._waiting += 1
+        try:
+            conn = await self._checkout(pool)
+        finally:
+            self._waiting -= 1
+        
+        checkout_time = time.perf_counter() - start_time
+        self._in_use += 1
+        self._checkouts += 1
+        self._checkout_time_total += checkout_time
+        self._checkout_time_max = max(self._checkout_time_max, checkout_time)
+        
+        server_pid = conn.get_server_pid()
+        try:
+            yield conn
+        finally:
+            self._in_use -= 1
+            self._remember_use(server_pid)
+            # потерянное соединение asyncpg уже отвязал от пула, тогда release ничего не делает
+            await pool.release(conn)
+    
+    def _remember_use(self, server_pid: int):
+
+        now = time.monotonic()
+        self._last_used[server_pid] = now
+        # записи пересозданных соединений больше не обновляются, их выбрасываем
+        if len(self._last_used) > 2 * self.max_size:
+            self._last_used = {
+                pid: last_used for pid, last_used in self._last_used.items()
+                if now - last_used < self.health_check_interval
+            }
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+
+        checkouts = self._checkouts
+        return {
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'in_use': self._in_use,
+            'idle': self._pool.get_idle_size() if self._pool is not None else 0,
+            'waiting': self._waiting,
+            'checkouts': checkouts,
+            'avg_checkout_ms': self._checkout_time_total / checkouts * 1000 if checkouts else 0.0,
+            'max_checkout_ms': self._checkout_time_max * 1000,
+            'health_check_failures': self._health_check_failures
+        }
+    
+    async def close(self):
+
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            self._last_used.clear()
+    
+    async def test_connection(self) -> bool:
+
+        try:
+            async with self.acquire() as conn:
+                return await conn.fetchval("SELECT 1") == 1
+        except Exception as e:
+            logger.error(f"Ошибка подключения к базе данных: {e}")
+            return False
+    
+    async def get_articles_count(self) -> int:
+
+        try:
+            async with self.acquire() as conn:
+                result = await conn.fetchval("SELECT COUNT(*) FROM articles")
+                return result or 0
+        except Exception as e:
+            logger.error(f"Ошибка при получении количества статей: {e}")
+            record_backend_error('postgres', 'get_articles_count')
+            return 0
+    
+    async def get_database_stats(self, top_hubs: int = 10) -> Optional[Dict[str, Any]]:
+
+        try:
+            async with self.acquire() as conn:
+                totals = await conn.fetchrow("""
+                    SELECT COUNT(*) AS total_articles,
+                           COALESCE(SUM(views), 0) AS total_views,
+                           COALESCE(AVG(views), 0) AS avg_views
+                    FROM articles
+                """)
+                hubs = await conn.fetch("""
+                    SELECT hub, articles_count AS count
+                    FROM hub_stats
+                    ORDER BY articles_count DESC, hub
+                    LIMIT $1
+                """, top_hubs)
+                return _database_stats(totals, hubs)
+        except Exception as e:
+            logger.error(f"Ошибка при получении статистики базы данных: {e}")
+            record_backend_error('postgres', 'get_database_stats')
+            return None
+    
+    async def get_article_by_id(self, article_id: int) -> Dict[str, Any]:
+
+        try:
+            async with self.acquire() as conn:
+                row = await conn.fetchrow("""
+                    SELECT id, url, title, text_content, tags, views, score, comments_count, scraped_at
+                    FROM articles
+                    WHERE id = $1
+                """, article_id)
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка при получении статьи {article_id}: {e}")
+            return None
+    
+    async def get_article_by_habr_id(self, habr_id: str) -> Dict[str, Any]:
+
+        try:
+            async with self.acquire() as conn:
+                row = await conn.fetchrow("""
+                    SELECT id, habr_id, url, title, text_content, tags, views, score, comments_count,
+                           word_count, has_code, has_images, title_length, tags_count, scraped_at
+                    FROM articles
+                    WHERE habr_id = $1
+                """, str(habr_id))
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка при получении статьи с Habr ID {habr_id}: {e}")
+            return None
+    
+    async def get_articles_by_ids(self, article_ids: List[int]) -> List[Dict[str, Any]]:
+
+        if not article_ids:
+            return []
+        
+        try:
+            async with self.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT id, url, title, text_content, tags, views, score, comments_count, scraped_at
+                    FROM articles
+                    WHERE id = ANY($1::int[])
+                """, list(article_ids))
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Ошибка при получении статей {len(article_ids)} ID: {e}")
+            return []
+    
+    async def get_articles_by_habr_ids(self, habr_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+
+        if not habr_ids:
+            return {}
+        
+        try:
+            async with self.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT id, habr_id, url, title, text_content, tags, views, score, comments_count,
+                           word_count, has_code, has_images, title_length, tags_count, scraped_at
+                    FROM articles
+                    WHERE habr_id = ANY($1::text[])
+                """, [str(habr_id) for habr_id in habr_ids])
+                return {row['habr_id']: dict(row) for row in rows}
+        except Exception as e:
+            logger.error(f"Ошибка при получении статей по {len(habr_ids)} Habr ID: {e}")
+            record_backend_error('postgres', 'get_articles_by_habr_ids')
+            return {}
+    
+    async def search_articles_by_title(self, search_term: str, limit: int = 10) -> List[Dict[str, Any]]:
+
+        try:
+            async with self.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT id, url, title, text_content, tags, views, score, comments_count
+                    FROM articles
+                    WHERE title ILIKE $1
+                    ORDER BY views DESC, score DESC
+                    LIMIT $2
+                """, f'%{search_term}%', limit)
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Ошибка при поиске статей: {e}")
             return []
+    
+    async def _get_article_page(self, limit: int, hub: str = None,
+                                after: KeysetCursor = None) -> Dict[str, Any]:
+        
+        query, params = _article_page_query(lambda i: f'${i}', limit, hub, after)
+        async with self.acquire() as conn:
+            rows = await conn.fetch(query, *params)
+            return _article_page([dict(row) for row in rows], limit)
+    
+    async def get_top_articles(self, limit: int = 10, after: KeysetCursor = None) -> Dict[str, Any]:
+
+        try:
+            return await self._get_article_page(limit, after=after)
+        except Exception as e:
+            logger.error(f"Ошибка при получении топ статей: {e}")
+            record_backend_error('postgres', 'get_top_articles')
+            return _article_page([], limit)
+    
+    async def get_articles_by_hub(self, hub: str, limit: int = 20,
+                                  after: KeysetCursor = None) -> Dict[str, Any]:
+        
+        try:
+            return await self._get_article_page(limit, hub=hub, after=after)
+        except Exception as e:
+            logger.error(f"Ошибка при получении статей хаба {hub}: {e}")
+            record_backend_error('postgres', 'get_articles_by_hub')
+            return _article_page([], limit)
 
 
 def main():
@@ -195,7 +952,7 @@ def main():
         count = db_manager.get_articles_count()
         print(f"В базе данных {count} статей")
         
-        top_articles = db_manager.get_top_articles(5)
+        top_articles = db_manager.get_top_articles(5)['articles']
         if top_articles:
             print("\nТоп 5 статей по просмотрам:")
             for i, article in enumerate(top_articles, 1):
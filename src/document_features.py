@@ -0,0 +1,67 @@
+import re
+from typing import Dict, Any, List
+
+STATIC_FEATURE_COLUMNS = ['word_count', 'has_code', 'has_images', 'title_length', 'tags_count']
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+_CODE_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in [
+    r'<code>.*?</code>',
+    r'```.*?```',
+    r'`.*?`',
+    r'<pre>.*?</pre>',
+    r'\{.*?\}',
+    r'function\s+\w+',
+    r'class\s+\w+',
+    r'def\s+\w+',
+    r'import\s+\w+',
+    r'from\s+\w+',
+]), re.DOTALL | re.IGNORECASE)
+
+_IMAGE_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in [
+    r'<img.*?>',
+    r'!\[.*?\]\(.*?\)',
+    r'<figure.*?>.*?</figure>',
+    r'\.jpg|\.jpeg|\.png|\.gif|\.svg',
+]), re.IGNORECASE)
+
+
+def word_count(text: Any) -> int:
+
+    if not text:
+        return 0
+    return len(_WORD_PATTERN.findall(str(text).lower()))
+
+
+def has_code(text: Any) -> int:
+
+    if not text:
+        return 0
+    return 1 if _CODE_PATTERN.search(str(text)) else 0
+
+
+def has_images(text: Any) -> int:
+
+    if not text:
+        return 0
+    return 1 if _IMAGE_PATTERN.search(str(text)) else 0
+
+
+def compute_static_features(title: Any, text_content: Any, tags: List[str]) -> Dict[str, int]:
+
+    return {
+        'word_count': word_count(text_content),
+        'has_code': has_code(text_content),
+        'has_images': has_images(text_content),
+        'title_length': len(str(title)) if title else 0,
+        'tags_count': len(tags) if hasattr(tags, '__len__') and not isinstance(tags, str) else 0
+    }
+
+
+def ensure_static_features(article: Dict[str, Any]) -> Dict[str, Any]:
+
+    if any(article.get(column) is None for column in STATIC_FEATURE_COLUMNS):
+        article.update(compute_static_features(
+            article.get('title'), article.get('text_content'), article.get('tags')
+        ))
+    return article
@@ -1,11 +1,98 @@
 import os
 import logging
 from typing import List, Dict, Any, Optional
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, AsyncElasticsearch
 from elasticsearch.exceptions import ConnectionError, NotFoundError
+from backend_metrics import record_backend_error
+from document_features import STATIC_FEATURE_COLUMNS, ensure_static_features
 
 logger = logging.getLogger(__name__)
 
+TEXT_PREFIX_LENGTH = 1000
+
+_RANKING_SOURCE_FIELDS = [
+    'title', 'url', 'tags', 'views', 'score', 'comments_count', 'text_prefix', *STATIC_FEATURE_COLUMNS
+]
+
+_SEARCH_HIGHLIGHT = {
+    "fields": {
+        "title": {},
+        "text_content": {
+            "fragment_size": 150,
+            "number_of_fragments": 3
+        }
+    }
+}
+
+
+# id как второй ключ делает порядок однозначным, без него search_after может пропускать документы с равным скором
+_SEARCH_SORT = [{"_score": "desc"}, {"id": "asc"}]
+
+
+def _build_search_query(query: str) -> Dict[str, Any]:
+    return {
+        "multi_match": {
+            "query": query,
+            "fields": [
+                "title^3",
+                "tags^2",
+                "text_content"
+            ],
+            "fuzziness": "AUTO",
+            "type": "best_fields"
+        }
+    }
+
+
+def _msearch_body(index_name: str, queries: List[str], top_n: int) -> List[Dict[str, Any]]:
+
+    searches = []
+    for query in queries:
+        searches.append({"index": index_name})
+        searches.append({
+            "query": _build_search_query(query),
+            "size": top_n,
+            "sort": _SEARCH_SORT,
+            "_source": _RANKING_SOURCE_FIELDS,
+            "highlight": _SEARCH_HIGHLIGHT
+        })
+    return searches
+
+
+def _msearch_candidates(queries: List[str], response: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+
+    results = []
+    for query, item in zip(queries, response['responses']):
+        if 'error' in item:
+            logger.error(f"Ошибка поиска в Elasticsearch для запроса '{query}': {item['error']}")
+            record_backend_error('elasticsearch', 'search_articles_many')
+            results.append([])
+        else:
+            results.append([_hit_to_candidate(hit) for hit in item['hits']['hits']])
+    return results
+
+
+def _hit_to_candidate(hit: Dict[str, Any]) -> Dict[str, Any]:
+    source = hit['_source']
+    candidate = {
+        'doc_id': int(hit['_id']),
+        'bm25_score': hit['_score'],
+        'title': source['title'],
+        'url': source['url'],
+        'views': source['views'],
+        'score': source.get('score', 0),
+        'comments_count': source['comments_count'],
+        'tags': source['tags'],
+        'highlights': hit.get('highlight', {}),
+        'sort': hit.get('sort')
+    }
+    if 'text_prefix' in source:
+        candidate['text_content'] = source['text_prefix']
+        for column in STATIC_FEATURE_COLUMNS:
+            candidate[column] = source.get(column)
+    return candidate
+
+
 class ElasticsearchManager:
     def __init__(self, host: str = None, port: int = None):
         self.host = host or os.getenv('ES_HOST', 'elasticsearch')
@@ -41,6 +128,15 @@ class ElasticsearchManager:
                                 "analyzer": "russian",
                                 "search_analyzer": "russian"
                             },
+                            "text_prefix": {
+                                "type": "text",
+                                "index": False
+                            },
+                            "word_count": {"type": "integer"},
+                            "has_code": {"type": "byte"},
+                            "has_images": {"type": "byte"},
+                            "title_length": {"type": "integer"},
+                            "tags_count": {"type": "integer"},
                             "tags": {
                                 "type": "keyword"
                             },
@@ -87,11 +183,14 @@ class ElasticsearchManager:
     
     def index_article(self, article: Dict[str, Any]) -> bool:
         try:
+            ensure_static_features(article)
             doc = {
                 'id': article['id'],
                 'url': article['url'],
                 'title': article['title'],
                 'text_content': article['text_content'],
+                'text_prefix': (article['text_content'] or '')[:TEXT_PREFIX_LENGTH],
+                **{column: article[column] for column in STATIC_FEATURE_COLUMNS},
                 'tags': article['tags'],
                 'views': article['views'],
                 'score': article['score'],
@@ -107,57 +206,45 @@ class ElasticsearchManager:
             logger.error(f"Ошибка индексации статьи {article.get('id', 'unknown')}: {e}")
             return False
     
-    def search_articles(self, query: str, top_n: int = 100) -> List[Dict[str, Any]]:
+    def search_articles(self, query: str, top_n: int = 100,
+                              search_after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
         try:
-            search_query = {
-                "multi_match": {
-                    "query": query,
-                    "fields": [
-                        "title^3",
-                        "tags^2",
-                        "text_content"
-                    ],
-                    "fuzziness": "AUTO",
-                    "type": "best_fields"
-                }
-            }
-            
             response = self.es.search(
                 index=self.index_name,
-                query=search_query,
+                query=_build_search_query(query),
                 size=top_n,
-                highlight={
-                    "fields": {
-                        "title": {},
-                        "text_content": {
-                            "fragment_size": 150,
-                            "number_of_fragments": 3
-                        }
-                    }
-                }
+                sort=_SEARCH_SORT,
+                search_after=search_after,
+                source=_RANKING_SOURCE_FIELDS,
+                highlight=_SEARCH_HIGHLIGHT
             )
             
-            candidates = []
-            for hit in response['hits']['hits']:
-                candidate = {
-                    'doc_id': int(hit['_id']),
-                    'bm25_score': hit['_score'],
-                    'title': hit['_source']['title'],
-                    'url': hit['_source']['url'],
-                    'views': hit['_source']['views'],
-                    'comments_count': hit['_source']['comments_count'],
-                    'tags': hit['_source']['tags'],
-                    'highlights': hit.get('highlight', {})
-                }
-                candidates.append(candidate)
+            candidates = [_hit_to_candidate(hit) for hit in response['hits']['hits']]
             
             logger.info(f"Найдено {len(candidates)} кандидатов для запроса '{query}'")
             return candidates
             
         except Exception as e:
             logger.error(f"Ошибка поиска в Elasticsearch: {e}")
+            record_backend_error('elasticsearch', 'search_articles')
             return []
     
+    def search_articles_many(self, queries: List[str], top_n: int = 100) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        try:
+            # один msearch на пачку запросов вместо отдельного search на каждый
+            response = self.es.msearch(searches=_msearch_body(self.index_name, queries, top_n))
+            results = _msearch_candidates(queries, response)
+            
+            logger.info(f"msearch: {len(queries)} запросов, {sum(len(candidates) for candidates in results)} кандидатов")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Ошибка msearch в Elasticsearch: {e}")
+            record_backend_error('elasticsearch', 'search_articles_many')
+            return [[] for _ in queries]
+    
     def get_article_by_id(self, doc_id: int) -> Optional[Dict[str, Any]]:
         try:
             response = self.es.get(index=self.index_name, id=doc_id)
@@ -178,6 +265,7 @@ class ElasticsearchManager:
             }
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
+            record_backend_error('elasticsearch', 'get_index_stats')
             return {}
     
     def reindex_all(self, articles: List[Dict[str, Any]]) -> int:
@@ -201,3 +289,77 @@ class ElasticsearchManager:
         except Exception as e:
             logger.error(f"Ошибка переиндексации: {e}")
             return 0
+
+
+class AsyncElasticsearchManager:
+    def __init__(self, host: str = None, port: int = None):
+        self.host = host or os.getenv('ES_HOST', 'elasticsearch')
+        self.port = port or int(os.getenv('ES_PORT', '9200'))
+        self.index_name = 'habr_articles'
+        
+        self.es = AsyncElasticsearch([{'host': self.host, 'port': self.port, 'scheme': 'http'}])
+    
+    async def search_articles(self, query: str, top_n: int = 100,
+                                    search_after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        try:
+            response = await self.es.search(
+                index=self.index_name,
+                query=_build_search_query(query),
+                size=top_n,
+                sort=_SEARCH_SORT,
+                search_after=search_after,
+                source=_RANKING_SOURCE_FIELDS,
+                highlight=_SEARCH_HIGHLIGHT
+            )
+            
+            candidates = [_hit_to_candidate(hit) for hit in response['hits']['hits']]
+            
+            logger.info(f"Найдено {len(candidates)} кандидатов для запроса '{query}'")
+            return candidates
+            
+        except Exception as e:
+            logger.error(f"Ошибка поиска в Elasticsearch: {e}")
+            record_backend_error('elasticsearch', 'search_articles')
+            return []
+    
+    async def search_articles_many(self, queries: List[str], top_n: int = 100) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        try:
+            # один msearch на пачку запросов вместо отдельного search на каждый
+            response = await self.es.msearch(searches=_msearch_body(self.index_name, queries, top_n))
+            results = _msearch_candidates(queries, response)
+            
+            logger.info(f"msearch: {len(queries)} запросов, {sum(len(candidates) for candidates in results)} кандидатов")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Ошибка msearch в Elasticsearch: {e}")
+            record_backend_error('elasticsearch', 'search_articles_many')
+            return [[] for _ in queries]
+    
+    async def get_article_by_id(self, doc_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            response = await self.es.get(index=self.index_name, id=doc_id)
+            return response['_source']
+        except NotFoundError:
+            logger.warning(f"Статья с ID {doc_id} не найдена")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка получения статьи {doc_id}: {e}")
+            return None
+    
+    async def get_index_stats(self) -> Dict[str, Any]:
+        try:
+            stats = await self.es.indices.stats(index=self.index_name)
+            return {
+                'total_docs': stats['indices'][self.index_name]['total']['docs']['count'],
+                'index_size': stats['indices'][self.index_name]['total']['store']['size_in_bytes']
+            }
+        except Exception as e:
+            logger.error(f"Ошибка получения статистики: {e}")
+            record_backend_error('elasticsearch', 'get_index_stats')
+            return {}
+    
+    async def close(self):
+        await self.es.close()
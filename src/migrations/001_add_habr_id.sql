@@ -0,0 +1,18 @@
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS habr_id TEXT;
+
+-- одна и та же статья может встречаться под разными URL (/articles/, /companies/.../articles/),
+-- habr_id получает только последняя собранная копия, остальные остаются с NULL
+UPDATE articles a
+SET habr_id = d.habr_id
+FROM (
+    SELECT DISTINCT ON (regexp_replace(url, '^.*/([^/]+)/?$', '\1'))
+           id,
+           regexp_replace(url, '^.*/([^/]+)/?$', '\1') AS habr_id
+    FROM articles
+    ORDER BY regexp_replace(url, '^.*/([^/]+)/?$', '\1'), scraped_at DESC
+) d
+WHERE a.id = d.id
+  AND a.habr_id IS NULL
+  AND NOT EXISTS (SELECT 1 FROM articles b WHERE b.habr_id = d.habr_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_habr_id ON articles(habr_id);
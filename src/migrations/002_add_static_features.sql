@@ -0,0 +1,7 @@
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS word_count INTEGER;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS has_code SMALLINT;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS has_images SMALLINT;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS title_length INTEGER;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS tags_count INTEGER;
+
+-- значения для существующих строк заполняет DatabaseManager.backfill_static_features()
@@ -0,0 +1,10 @@
+CREATE MATERIALIZED VIEW IF NOT EXISTS hub_stats AS
+SELECT tag AS hub, COUNT(*) AS articles_count
+FROM articles, unnest(tags) AS tag
+GROUP BY tag;
+
+-- уникальный индекс нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_hub_stats_hub ON hub_stats(hub);
+CREATE INDEX IF NOT EXISTS idx_hub_stats_articles_count ON hub_stats(articles_count DESC);
+
+-- обновляет DatabaseManager.refresh_hub_stats() после загрузки статей в DAG
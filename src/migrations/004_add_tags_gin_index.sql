@@ -0,0 +1,4 @@
+CREATE INDEX IF NOT EXISTS idx_articles_tags ON articles USING GIN (tags);
+
+-- порядок выдачи хабов и топа статей; id делает ключ курсора уникальным
+CREATE INDEX IF NOT EXISTS idx_articles_views_score_id ON articles(views, score, id);
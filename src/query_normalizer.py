@@ -0,0 +1,103 @@
+import os
+import re
+import logging
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = frozenset({
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она',
+    'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее',
+    'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из', 'ему', 'теперь', 'когда',
+    'даже', 'ну', 'вдруг', 'ли', 'если', 'уже', 'или', 'ни', 'быть', 'был', 'него', 'до',
+    'вас', 'нибудь', 'опять', 'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей',
+    'может', 'они', 'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем',
+    'была', 'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет',
+    'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем', 'ним', 'здесь',
+    'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас', 'были', 'куда', 'зачем',
+    'всех', 'никогда', 'можно', 'при', 'наконец', 'два', 'об', 'другой', 'хоть', 'после',
+    'над', 'больше', 'тот', 'через', 'эти', 'нас', 'про', 'всего', 'них', 'какая', 'много',
+    'разве', 'три', 'эту', 'моя', 'впрочем', 'хорошо', 'свою', 'этой', 'перед', 'иногда',
+    'лучше', 'чуть', 'том', 'нельзя', 'такой', 'им', 'более', 'всегда', 'конечно', 'всю',
+    'между'
+})
+
+_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+_morph = None
+
+
+def _get_morph():
+
+    global _morph
+    if _morph is None:
+        from pymorphy2 import MorphAnalyzer
+        _morph = MorphAnalyzer()
+    return _morph
+
+
+@lru_cache(maxsize=100000)
+def lemmatize(word: str) -> str:
+
+    parsed = _get_morph().parse(word)
+    return parsed[0].normal_form if parsed else word
+
+
+def canonicalize(text: str) -> str:
+
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text)).casefold()
+    return ' '.join(text.split())
+
+
+def tokenize(text: str) -> List[str]:
+
+    text = canonicalize(text)
+    if not text:
+        return []
+    
+    return [
+        lemmatize(word)
+        for word in _PUNCTUATION_PATTERN.sub(' ', text).split()
+        if word not in STOPWORDS and len(word) > 2
+    ]
+
+
+class QueryNormalizer:
+
+    def __init__(self, lemmatize_queries: bool = None):
+
+        if lemmatize_queries is None:
+            lemmatize_queries = os.getenv('QUERY_LEMMATIZE', 'false').lower() in ('1', 'true', 'yes')
+        
+        if lemmatize_queries:
+            try:
+                _get_morph()
+            except Exception as e:
+                logger.warning(f"pymorphy2 недоступен, лемматизация запросов отключена: {e}")
+                lemmatize_queries = False
+        
+        self.lemmatize_queries = lemmatize_queries
+    
+    def normalize(self, query: str) -> str:
+
+        canonical = canonicalize(query)
+        if not self.lemmatize_queries:
+            return canonical
+        
+        # запрос из одних стоп-слов или коротких слов оставляем в каноническом виде, иначе он станет пустым
+        return ' '.join(tokenize(canonical)) or canonical
+
+
+_default_normalizer = None
+
+
+def normalize_query(query: str) -> str:
+
+    global _default_normalizer
+    if _default_normalizer is None:
+        _default_normalizer = QueryNormalizer()
+    return _default_normalizer.normalize(query)
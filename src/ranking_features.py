@@ -0,0 +1,173 @@
+import re
+from collections import namedtuple
+from typing import Any, Dict, List, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from document_features import STATIC_FEATURE_COLUMNS, compute_static_features
+
+FEATURE_SCHEMA_VERSION = 1
+
+TEXT_OVERLAP_LENGTH = 1000
+
+_NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+
+Feature = namedtuple('Feature', ['name', 'compute'])
+
+
+class FeatureSchemaError(ValueError):
+    pass
+
+
+def _tokens(text: Any) -> frozenset:
+
+    if not text:
+        return frozenset()
+    return frozenset(word for word in _NON_WORD_PATTERN.sub(' ', str(text).lower()).split() if len(word) > 2)
+
+
+def _has_items(value: Any) -> bool:
+    return hasattr(value, '__len__') and not isinstance(value, str) and len(value) > 0
+
+
+def _is_missing(value: Any) -> bool:
+    # None из API и NaN/pd.NA из parquet обучения должны давать одинаковые признаки
+    return np.ndim(value) == 0 and bool(pd.isna(value))
+
+
+def _text(value: Any) -> str:
+    return '' if _is_missing(value) else str(value)
+
+
+class FeatureBatch:
+
+    def __init__(self, queries: Union[str, Sequence[str]], documents: Sequence[Mapping[str, Any]],
+                 tfidf_similarity: np.ndarray = None):
+        
+        n = len(documents)
+        if isinstance(queries, str):
+            queries = [queries] * n
+        if len(queries) != n:
+            raise ValueError(f"Количество запросов ({len(queries)}) не совпадает с количеством документов ({n})")
+        
+        self.size = n
+        self.queries = [str(query) if query is not None else '' for query in queries]
+        self.documents = documents
+        self.tfidf_similarity = (
+            np.zeros(n, dtype=np.float64) if tfidf_similarity is None
+            else np.asarray(tfidf_similarity, dtype=np.float64)
+        )
+        
+        query_tokens = {query: _tokens(query) for query in set(self.queries)}
+        self.query_tokens = [query_tokens[query] for query in self.queries]
+        self.titles = [_text(document.get('title')) for document in documents]
+        self.texts = [_text(document.get('text_content')) for document in documents]
+        self.tags = [document.get('tags') if _has_items(document.get('tags')) else [] for document in documents]
+        
+        static_rows = [
+            document if not any(_is_missing(document.get(column)) for column in STATIC_FEATURE_COLUMNS)
+            else compute_static_features(title, text, tags)
+            for document, title, text, tags in zip(documents, self.titles, self.texts, self.tags)
+        ]
+        self.static = {
+            column: np.array([row[column] for row in static_rows], dtype=np.float64)
+            for column in STATIC_FEATURE_COLUMNS
+        }
+    
+    def numeric(self, key: str) -> np.ndarray:
+
+        values = [document.get(key) for document in self.documents]
+        return np.array([0 if _is_missing(value) else value for value in values], dtype=np.float64)
+
+
+def _freshness(batch: FeatureBatch) -> np.ndarray:
+    return np.maximum(1, 100 - np.minimum(99, batch.numeric('views') // 100))
+
+
+def _query_in_title(batch: FeatureBatch) -> np.ndarray:
+
+    return np.array([
+        1.0 if query_tokens & _tokens(title) else 0.0
+        for query_tokens, title in zip(batch.query_tokens, batch.titles)
+    ])
+
+
+def _query_in_tags(batch: FeatureBatch) -> np.ndarray:
+
+    result = np.zeros(batch.size, dtype=np.float64)
+    for i, (query, tags) in enumerate(zip(batch.queries, batch.tags)):
+        query_lower = query.lower().strip()
+        result[i] = any(query_lower == str(tag).lower().strip() for tag in tags)
+    return result
+
+
+def _text_overlap_ratio(batch: FeatureBatch) -> np.ndarray:
+
+    return np.array([
+        len(query_tokens & _tokens(text[:TEXT_OVERLAP_LENGTH])) / len(query_tokens) if query_tokens else 0.0
+        for query_tokens, text in zip(batch.query_tokens, batch.texts)
+    ])
+
+
+FEATURE_SPEC = [
+    Feature('freshness', _freshness),
+    Feature('author_rating', lambda batch: batch.numeric('score')),
+    Feature('views', lambda batch: batch.numeric('views')),
+    Feature('comments_count', lambda batch: batch.numeric('comments_count')),
+    Feature('article_word_count', lambda batch: batch.static['word_count']),
+    Feature('has_code', lambda batch: batch.static['has_code']),
+    Feature('has_images', lambda batch: batch.static['has_images']),
+    Feature('title_length', lambda batch: batch.static['title_length']),
+    Feature('tags_count', lambda batch: batch.static['tags_count']),
+    Feature('tfidf_similarity', lambda batch: batch.tfidf_similarity),
+    Feature('query_in_title', _query_in_title),
+    Feature('query_in_tags', _query_in_tags),
+    Feature('text_overlap_ratio', _text_overlap_ratio),
+    Feature('query_length', lambda batch: np.array([len(query.split()) for query in batch.queries], dtype=np.float64)),
+]
+
+FEATURE_COLUMNS = [feature.name for feature in FEATURE_SPEC]
+
+
+def build_feature_matrix(queries: Union[str, Sequence[str]], documents: Sequence[Mapping[str, Any]],
+                         tfidf_similarity: np.ndarray = None) -> np.ndarray:
+    
+    batch = FeatureBatch(queries, documents, tfidf_similarity)
+    features = np.zeros((batch.size, len(FEATURE_SPEC)), dtype=np.float64)
+    if batch.size == 0:
+        return features
+    
+    for column, feature in enumerate(FEATURE_SPEC):
+        features[:, column] = feature.compute(batch)
+    return features
+
+
+def feature_schema() -> Dict[str, Any]:
+
+    return {
+        'version': FEATURE_SCHEMA_VERSION,
+        'columns': list(FEATURE_COLUMNS)
+    }
+
+
+def validate_feature_schema(schema: Mapping[str, Any], n_model_features: int = None) -> List[str]:
+
+    if not schema:
+        raise FeatureSchemaError("Схема признаков отсутствует, модель обучена старой версией пайплайна")
+    
+    if schema.get('version') != FEATURE_SCHEMA_VERSION:
+        raise FeatureSchemaError(
+            f"Версия схемы признаков модели {schema.get('version')} не совпадает с текущей {FEATURE_SCHEMA_VERSION}"
+        )
+    
+    columns = list(schema.get('columns') or [])
+    if columns != FEATURE_COLUMNS:
+        raise FeatureSchemaError(f"Признаки модели {columns} не совпадают с текущими {FEATURE_COLUMNS}")
+    
+    if n_model_features is not None and n_model_features != len(columns):
+        raise FeatureSchemaError(
+            f"Модель ожидает {n_model_features} признаков, схема описывает {len(columns)}"
+        )
+    
+    return columns
@@ -1,24 +1,83 @@
 import os
+import re
 import json
+import time
+import uuid
 import logging
 import hashlib
-from typing import Any, Optional, Dict
+from typing import Any, Callable, Optional, Dict, List, Tuple
 import redis
+import redis.asyncio as aioredis
+
+from backend_metrics import record_backend_error
+from cache_codec import CacheCodec
+from document_features import STATIC_FEATURE_COLUMNS
 
 logger = logging.getLogger(__name__)
 
+CACHE_INVALIDATION_CHANNEL = 'cache_invalidation'
+
+CACHE_GENERATION_KEY = 'cache:generation'
+CACHE_GENERATION_REFRESH_INTERVAL = 1.0
+
+# ключи этих префиксов живут в пространстве поколения: prefix:g{поколение}:...
+_GENERATION_PREFIXES = ('ranked', 'article', 'stats', 'page')
+_GENERATION_KEY_PATTERN = re.compile(r'^[a-z_]+:g(\d+):')
+
+# поля хэша статьи article:g{N}:{id}: отображение результата и входы ранжирования вместо полной строки PostgreSQL
+ARTICLE_DISPLAY_FIELDS = ('title', 'url', 'views', 'comments_count', 'tags')
+ARTICLE_RANKING_FIELDS = (*ARTICLE_DISPLAY_FIELDS, 'text_prefix', 'score', *STATIC_FEATURE_COLUMNS)
+
+# поколение общее на процесс, его обновляет и pub/sub подписка
+_generation = {'value': 0, 'checked_at': float('-inf')}
+
+
+def _generate_cache_key(prefix: str, data: Any) -> str:
+    data_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    data_hash = hashlib.md5(data_str.encode('utf-8')).hexdigest()
+    return f"{prefix}:{data_hash}"
+
+
+def _generation_is_fresh() -> bool:
+    return time.monotonic() - _generation['checked_at'] < CACHE_GENERATION_REFRESH_INTERVAL
+
+
+def _remember_generation(value: Any) -> int:
+    _generation['value'] = int(value or 0)
+    _generation['checked_at'] = time.monotonic()
+    return _generation['value']
+
+
+def _forget_generation():
+    _generation['checked_at'] = float('-inf')
+
+
+def _is_stale_generation_key(key: str, current: int) -> bool:
+    match = _GENERATION_KEY_PATTERN.match(key)
+    return match is not None and int(match.group(1)) < current
+
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
 class RedisManager:
     def __init__(self, host: str = None, port: int = None, db: int = None):
         self.host = host or os.getenv('REDIS_HOST', 'redis')
         self.port = port or int(os.getenv('REDIS_PORT', '6379'))
         self.db = db or int(os.getenv('REDIS_DB', '0'))
+        self.codec = CacheCodec()
         
         try:
             self.redis_client = redis.Redis(
                 host=self.host,
                 port=self.port,
                 db=self.db,
-                decode_responses=True
+                decode_responses=False
             )
             
             self.redis_client.ping()
@@ -28,10 +87,19 @@ class RedisManager:
             logger.error(f"Ошибка подключения к Redis: {e}")
             self.redis_client = None
     
+    def get_cache_generation(self) -> int:
+        if self.redis_client and not _generation_is_fresh():
+            try:
+                _remember_generation(self.redis_client.get(CACHE_GENERATION_KEY))
+            except Exception as e:
+                logger.error(f"Ошибка получения поколения кэша: {e}")
+        return _generation['value']
+    
+    def _namespace(self, prefix: str) -> str:
+        return f"{prefix}:g{self.get_cache_generation()}"
+    
     def _generate_cache_key(self, prefix: str, data: Any) -> str:
-        data_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
-        data_hash = hashlib.md5(data_str.encode('utf-8')).hexdigest()
-        return f"{prefix}:{data_hash}"
+        return _generate_cache_key(self._namespace(prefix), data)
     
     def get(self, key: str) -> Optional[Any]:
         if not self.redis_client:
@@ -40,10 +108,11 @@ class RedisManager:
         try:
             data = self.redis_client.get(key)
             if data:
-                return json.loads(data)
+                return self.codec.decode(data)
             return None
         except Exception as e:
             logger.error(f"Ошибка получения из кэша: {e}")
+            record_backend_error('redis', 'get')
             return None
     
     def set(self, key: str, value: Any, expire: int = 600) -> bool:
@@ -51,17 +120,13 @@ class RedisManager:
             return False
             
         try:
-            def json_serializer(obj):
-                if hasattr(obj, 'isoformat'):
-                    return obj.isoformat()
-                raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-            
-            data = json.dumps(value, ensure_ascii=False, default=json_serializer)
+            data = self.codec.encode(value)
             self.redis_client.setex(key, expire, data)
             logger.debug(f"Данные сохранены в кэш: {key}")
             return True
         except Exception as e:
             logger.error(f"Ошибка сохранения в кэш: {e}")
+            record_backend_error('redis', 'set')
             return False
     
     def delete(self, key: str) -> bool:
@@ -76,57 +141,218 @@ class RedisManager:
             logger.error(f"Ошибка удаления из кэша: {e}")
             return False
     
-    def cache_search_results(self, query: str, top_n: int, results: list, expire: int = 600) -> bool:
-        from datetime import datetime
+    def acquire_lock(self, name: str, ttl: int = 30) -> Optional[str]:
+        # None - блокировку держит другой процесс, '' - Redis недоступен и работаем без блокировки
+        if not self.redis_client:
+            return ''
         
-        cache_data = {
-            'query': query,
-            'top_n': top_n,
-            'results': results,
-            'cached_at': datetime.now().isoformat()
-        }
+        try:
+            token = uuid.uuid4().hex
+            if self.redis_client.set(f"lock:{name}", token, nx=True, ex=ttl):
+                return token
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка получения блокировки {name}: {e}")
+            return ''
+    
+    def release_lock(self, name: str, token: str) -> bool:
+        if not self.redis_client or not token:
+            return False
         
-        key = self._generate_cache_key('search', {'query': query, 'top_n': top_n})
-        return self.set(key, cache_data, expire)
+        try:
+            return bool(self.redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{name}", token))
+        except Exception as e:
+            logger.error(f"Ошибка освобождения блокировки {name}: {e}")
+            return False
     
-    def get_cached_search_results(self, query: str, top_n: int) -> Optional[list]:
-        key = self._generate_cache_key('search', {'query': query, 'top_n': top_n})
-        cached_data = self.get(key)
+    def publish_invalidation(self, cache: str = None, keys: List[Any] = None, generation: int = None) -> bool:
+        # cache=None и keys=None - сбросить локальные кэши всех воркеров целиком
+        if not self.redis_client:
+            return False
+        
+        try:
+            message = {'cache': cache, 'keys': keys, 'generation': generation}
+            self.redis_client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(message))
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка публикации инвалидации кэша: {e}")
+            return False
+    
+    def subscribe_invalidation(self, handler: Callable[[Dict[str, Any]], None]):
+        if not self.redis_client:
+            return None
+        
+        def on_message(message):
+            try:
+                data = json.loads(message['data'])
+                if data.get('generation') is not None:
+                    _remember_generation(data['generation'])
+                handler(data)
+            except Exception as e:
+                logger.error(f"Ошибка обработки инвалидации кэша: {e}")
         
-        if cached_data and cached_data.get('query') == query:
-            logger.info(f"Результаты найдены в кэше для запроса: {query}")
-            return cached_data.get('results')
+        def on_error(error, pubsub, thread):
+            # сообщения за время разрыва потеряны, поэтому сбрасываем локальные кэши целиком
+            logger.warning(f"Подписка на инвалидацию кэша прервана: {error}")
+            _forget_generation()
+            handler({'cache': None, 'keys': None})
+            time.sleep(1.0)
         
-        return None
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: on_message})
+            return pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=on_error)
+        except Exception as e:
+            logger.error(f"Ошибка подписки на инвалидацию кэша: {e}")
+            return None
     
-    def cache_article_metadata(self, article_id: int, metadata: Dict[str, Any], expire: int = 3600) -> bool:
-        key = f"article_meta:{article_id}"
-        return self.set(key, metadata, expire)
+    def cache_ranked_list(self, mode: str, query: str, version: str, ranked: Dict[str, Any],
+                          expire: int = 600) -> bool:
+        key = self._generate_cache_key('ranked', {'mode': mode, 'query': query, 'version': version})
+        return self.set(key, ranked, expire)
     
-    def get_cached_article_metadata(self, article_id: int) -> Optional[Dict[str, Any]]:
-        key = f"article_meta:{article_id}"
+    def get_cached_ranked_list(self, mode: str, query: str, version: str) -> Optional[Dict[str, Any]]:
+        key = self._generate_cache_key('ranked', {'mode': mode, 'query': query, 'version': version})
         return self.get(key)
     
+    def cache_page_bytes(self, mode: str, query: str, version: str, offset: int, top_n: int,
+                         body: bytes, expire: int = 600) -> bool:
+        if not self.redis_client:
+            return False
+        
+        # тело страницы уже закодировано в JSON и отдается в ответ как есть, поэтому кодек кэша не применяется
+        try:
+            key = self._generate_cache_key(
+                'page', {'mode': mode, 'query': query, 'version': version, 'offset': offset, 'top_n': top_n}
+            )
+            self.redis_client.setex(key, expire, body)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения страницы в кэш: {e}")
+            record_backend_error('redis', 'cache_page_bytes')
+            return False
+    
+    def get_cached_page_bytes(self, mode: str, query: str, version: str, offset: int,
+                              top_n: int) -> Optional[bytes]:
+        if not self.redis_client:
+            return None
+        
+        try:
+            key = self._generate_cache_key(
+                'page', {'mode': mode, 'query': query, 'version': version, 'offset': offset, 'top_n': top_n}
+            )
+            return self.redis_client.get(key)
+        except Exception as e:
+            logger.error(f"Ошибка получения страницы из кэша: {e}")
+            record_backend_error('redis', 'get_cached_page_bytes')
+            return None
+    
+    def cache_article_fields(self, articles: Dict[int, Dict[str, Any]], expire: int = 3600) -> bool:
+        if not self.redis_client or not articles:
+            return False
+        
+        try:
+            namespace = self._namespace('article')
+            pipe = self.redis_client.pipeline(transaction=False)
+            for article_id, fields in articles.items():
+                key = f"{namespace}:{article_id}"
+                pipe.hset(key, mapping={field: self.codec.encode(value) for field, value in fields.items()})
+                pipe.expire(key, expire)
+            pipe.execute()
+            logger.debug(f"В кэш сохранены поля {len(articles)} статей")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения полей статей в кэш: {e}")
+            record_backend_error('redis', 'cache_article_fields')
+            return False
+    
+    def get_cached_article_fields(self, article_ids: List[int], fields: Tuple[str, ...]) -> Dict[int, Dict[str, Any]]:
+        if not self.redis_client or not article_ids:
+            return {}
+        
+        try:
+            namespace = self._namespace('article')
+            pipe = self.redis_client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.hmget(f"{namespace}:{article_id}", fields)
+            rows = pipe.execute()
+            # статья найдена, только если в хэше есть все запрошенные поля
+            return {
+                article_id: {field: self.codec.decode(value) for field, value in zip(fields, values)}
+                for article_id, values in zip(article_ids, rows)
+                if all(value is not None for value in values)
+            }
+        except Exception as e:
+            logger.error(f"Ошибка получения полей статей из кэша: {e}")
+            record_backend_error('redis', 'get_cached_article_fields')
+            return {}
+    
     def cache_stats(self, stats: Dict[str, Any], expire: int = 1800) -> bool:
-        return self.set('stats', stats, expire)
+        return self.set(f"{self._namespace('stats')}:db", stats, expire)
     
     def get_cached_stats(self) -> Optional[Dict[str, Any]]:
-        return self.get('stats')
+        return self.get(f"{self._namespace('stats')}:db")
     
-    def clear_cache(self, pattern: str = "*") -> bool:
+    def _unlink_scanned(self, pattern: str, batch_size: int, should_remove: Callable[[str], bool]) -> int:
+        # SCAN не блокирует Redis как KEYS, UNLINK освобождает память в фоновом потоке
+        removed = 0
+        batch = []
+        for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+            if should_remove(key.decode('utf-8', 'replace')):
+                batch.append(key)
+            if len(batch) >= batch_size:
+                removed += self.redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            removed += self.redis_client.unlink(*batch)
+        return removed
+    
+    def clear_cache(self, pattern: str = "*", batch_size: int = 1000) -> bool:
         if not self.redis_client:
             return False
             
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                self.redis_client.delete(*keys)
-                logger.info(f"Очищено {len(keys)} ключей кэша")
+            removed = self._unlink_scanned(pattern, batch_size, lambda key: True)
+            logger.info(f"Очищено {removed} ключей кэша")
+            _forget_generation()
+            self.publish_invalidation()
             return True
         except Exception as e:
             logger.error(f"Ошибка очистки кэша: {e}")
             return False
     
+    def bump_cache_generation(self) -> Optional[int]:
+        # записи прошлых поколений становятся недостижимы сразу, память освобождают TTL и purge_stale_generations
+        if not self.redis_client:
+            return None
+        
+        try:
+            generation = _remember_generation(self.redis_client.incr(CACHE_GENERATION_KEY))
+            self.publish_invalidation(generation=generation)
+            logger.info(f"Поколение кэша увеличено до {generation}")
+            return generation
+        except Exception as e:
+            logger.error(f"Ошибка смены поколения кэша: {e}")
+            return None
+    
+    def purge_stale_generations(self, batch_size: int = 1000) -> int:
+        if not self.redis_client:
+            return 0
+        
+        try:
+            current = _remember_generation(self.redis_client.get(CACHE_GENERATION_KEY))
+            removed = sum(
+                self._unlink_scanned(
+                    f"{prefix}:g*", batch_size, lambda key: _is_stale_generation_key(key, current)
+                )
+                for prefix in _GENERATION_PREFIXES
+            )
+            logger.info(f"Удалено {removed} ключей устаревших поколений кэша")
+            return removed
+        except Exception as e:
+            logger.error(f"Ошибка очистки устаревших поколений кэша: {e}")
+            return 0
+    
     def get_cache_stats(self) -> Dict[str, Any]:
         if not self.redis_client:
             return {}
@@ -143,3 +369,177 @@ class RedisManager:
         except Exception as e:
             logger.error(f"Ошибка получения статистики кэша: {e}")
             return {}
+
+
+class AsyncRedisManager:
+    def __init__(self, host: str = None, port: int = None, db: int = None):
+        self.host = host or os.getenv('REDIS_HOST', 'redis')
+        self.port = port or int(os.getenv('REDIS_PORT', '6379'))
+        self.db = db or int(os.getenv('REDIS_DB', '0'))
+        self.codec = CacheCodec()
+        
+        self.redis_client = aioredis.Redis(
+            host=self.host,
+            port=self.port,
+            db=self.db,
+            decode_responses=False
+        )
+    
+    async def get_cache_generation(self) -> int:
+        if not _generation_is_fresh():
+            try:
+                _remember_generation(await self.redis_client.get(CACHE_GENERATION_KEY))
+            except Exception as e:
+                logger.error(f"Ошибка получения поколения кэша: {e}")
+        return _generation['value']
+    
+    async def _namespace(self, prefix: str) -> str:
+        return f"{prefix}:g{await self.get_cache_generation()}"
+    
+    async def _generate_cache_key(self, prefix: str, data: Any) -> str:
+        return _generate_cache_key(await self._namespace(prefix), data)
+    
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            data = await self.redis_client.get(key)
+            if data:
+                return self.codec.decode(data)
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка получения из кэша: {e}")
+            record_backend_error('redis', 'get')
+            return None
+    
+    async def set(self, key: str, value: Any, expire: int = 600) -> bool:
+        try:
+            data = self.codec.encode(value)
+            await self.redis_client.setex(key, expire, data)
+            logger.debug(f"Данные сохранены в кэш: {key}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения в кэш: {e}")
+            record_backend_error('redis', 'set')
+            return False
+    
+    async def delete(self, key: str) -> bool:
+        try:
+            await self.redis_client.delete(key)
+            logger.debug(f"Данные удалены из кэша: {key}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления из кэша: {e}")
+            return False
+    
+    async def acquire_lock(self, name: str, ttl: int = 30) -> Optional[str]:
+        # None - блокировку держит другой процесс, '' - Redis недоступен и работаем без блокировки
+        try:
+            token = uuid.uuid4().hex
+            if await self.redis_client.set(f"lock:{name}", token, nx=True, ex=ttl):
+                return token
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка получения блокировки {name}: {e}")
+            return ''
+    
+    async def release_lock(self, name: str, token: str) -> bool:
+        if not token:
+            return False
+        
+        try:
+            return bool(await self.redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{name}", token))
+        except Exception as e:
+            logger.error(f"Ошибка освобождения блокировки {name}: {e}")
+            return False
+    
+    async def publish_invalidation(self, cache: str = None, keys: List[Any] = None, generation: int = None) -> bool:
+        try:
+            message = {'cache': cache, 'keys': keys, 'generation': generation}
+            await self.redis_client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(message))
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка публикации инвалидации кэша: {e}")
+            return False
+    
+    async def cache_ranked_list(self, mode: str, query: str, version: str, ranked: Dict[str, Any],
+                                expire: int = 600) -> bool:
+        key = await self._generate_cache_key('ranked', {'mode': mode, 'query': query, 'version': version})
+        return await self.set(key, ranked, expire)
+    
+    async def get_cached_ranked_list(self, mode: str, query: str, version: str) -> Optional[Dict[str, Any]]:
+        key = await self._generate_cache_key('ranked', {'mode': mode, 'query': query, 'version': version})
+        return await self.get(key)
+    
+    async def cache_page_bytes(self, mode: str, query: str, version: str, offset: int, top_n: int,
+                               body: bytes, expire: int = 600) -> bool:
+        # тело страницы уже закодировано в JSON и отдается в ответ как есть, поэтому кодек кэша не применяется
+        try:
+            key = await self._generate_cache_key(
+                'page', {'mode': mode, 'query': query, 'version': version, 'offset': offset, 'top_n': top_n}
+            )
+            await self.redis_client.setex(key, expire, body)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения страницы в кэш: {e}")
+            record_backend_error('redis', 'cache_page_bytes')
+            return False
+    
+    async def get_cached_page_bytes(self, mode: str, query: str, version: str, offset: int,
+                                    top_n: int) -> Optional[bytes]:
+        try:
+            key = await self._generate_cache_key(
+                'page', {'mode': mode, 'query': query, 'version': version, 'offset': offset, 'top_n': top_n}
+            )
+            return await self.redis_client.get(key)
+        except Exception as e:
+            logger.error(f"Ошибка получения страницы из кэша: {e}")
+            record_backend_error('redis', 'get_cached_page_bytes')
+            return None
+    
+    async def cache_article_fields(self, articles: Dict[int, Dict[str, Any]], expire: int = 3600) -> bool:
+        if not articles:
+            return False
+        
+        try:
+            namespace = await self._namespace('article')
+            pipe = self.redis_client.pipeline(transaction=False)
+            for article_id, fields in articles.items():
+                key = f"{namespace}:{article_id}"
+                pipe.hset(key, mapping={field: self.codec.encode(value) for field, value in fields.items()})
+                pipe.expire(key, expire)
+            await pipe.execute()
+            logger.debug(f"В кэш сохранены поля {len(articles)} статей")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения полей статей в кэш: {e}")
+            record_backend_error('redis', 'cache_article_fields')
+            return False
+    
+    async def get_cached_article_fields(self, article_ids: List[int],
+                                        fields: Tuple[str, ...]) -> Dict[int, Dict[str, Any]]:
+        if not article_ids:
+            return {}
+        
+        try:
+            namespace = await self._namespace('article')
+            pipe = self.redis_client.pipeline(transaction=False)
+            for article_id in article_ids:
+                pipe.hmget(f"{namespace}:{article_id}", fields)
+            rows = await pipe.execute()
+            return {
+                article_id: {field: self.codec.decode(value) for field, value in zip(fields, values)}
+                for article_id, values in zip(article_ids, rows)
+                if all(value is not None for value in values)
+            }
+        except Exception as e:
+            logger.error(f"Ошибка получения полей статей из кэша: {e}")
+            record_backend_error('redis', 'get_cached_article_fields')
+            return {}
+    
+    async def cache_stats(self, stats: Dict[str, Any], expire: int = 1800) -> bool:
+        return await self.set(f"{await self._namespace('stats')}:db", stats, expire)
+    
+    async def get_cached_stats(self) -> Optional[Dict[str, Any]]:
+        return await self.get(f"{await self._namespace('stats')}:db")
+    
+    async def close(self):
+        await self.redis_client.close()
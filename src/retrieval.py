@@ -2,11 +2,10 @@ import os
 import pandas as pd
 import numpy as np
 from rank_bm25 import BM25Okapi
-from pymorphy2 import MorphAnalyzer
-import re
 from typing import List, Tuple, Dict
 import logging
 from db_manager import DatabaseManager
+from query_normalizer import STOPWORDS, tokenize
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,28 +13,12 @@ logger = logging.getLogger(__name__)
 class BM25Retriever:
     def __init__(self, db_config: Dict[str, str] = None):
         self.db_manager = DatabaseManager(db_config)
-        self.morph = MorphAnalyzer()
         self.bm25 = None
         self.documents = None
         self.document_ids = None
         self.tokenized_docs = None
         
-        self.stopwords = {
-            'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она',
-            'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее',
-            'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из', 'ему', 'теперь', 'когда',
-            'даже', 'ну', 'вдруг', 'ли', 'если', 'уже', 'или', 'ни', 'быть', 'был', 'него', 'до',
-            'вас', 'нибудь', 'опять', 'уж', 'вам', 'ведь', 'там', 'потом', 'себя', 'ничего', 'ей',
-            'может', 'они', 'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем',
-            'была', 'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет',
-            'ж', 'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'совсем', 'ним', 'здесь',
-            'этом', 'один', 'почти', 'мой', 'тем', 'чтобы', 'нее', 'сейчас', 'были', 'куда', 'зачем',
-            'всех', 'никогда', 'можно', 'при', 'наконец', 'два', 'об', 'другой', 'хоть', 'после',
-            'над', 'больше', 'тот', 'через', 'эти', 'нас', 'про', 'всего', 'них', 'какая', 'много',
-            'разве', 'три', 'эту', 'моя', 'впрочем', 'хорошо', 'свою', 'этой', 'перед', 'иногда',
-            'лучше', 'чуть', 'том', 'нельзя', 'такой', 'им', 'более', 'всегда', 'конечно', 'всю',
-            'между'
-        }
+        self.stopwords = STOPWORDS
     
     def load_documents(self):
         try:
@@ -59,22 +42,7 @@ class BM25Retriever:
             raise
     
     def preprocess_text(self, text: str) -> List[str]:
-        if not text:
-            return []
-        
-        text = re.sub(r'[^\w\s]', ' ', text.lower())
-        
-        words = text.split()
-        
-        processed_words = []
-        for word in words:
-            if word not in self.stopwords and len(word) > 2:
-                parsed = self.morph.parse(word)
-                if parsed:
-                    lemma = parsed[0].normal_form
-                    processed_words.append(lemma)
-        
-        return processed_words
+        return tokenize(text)
     
     def fit(self):
         if self.documents is None:
@@ -0,0 +1,32 @@
+import logging
+from db_manager import DatabaseManager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    db_manager = DatabaseManager()
+    
+    logger.info("Проверяем подключение к базе данных")
+    if not db_manager.test_connection():
+        logger.error("Не удалось подключиться к базе данных")
+        return
+    
+    applied = db_manager.apply_migrations()
+    
+    if applied:
+        logger.info(f"Применено миграций: {len(applied)}")
+        for migration in applied:
+            logger.info(f"  {migration}")
+    else:
+        logger.info("Новых миграций нет")
+    
+    backfilled = db_manager.backfill_static_features()
+    logger.info(f"Статических признаков заполнено: {backfilled}")
+
+
+if __name__ == "__main__":
+    main()
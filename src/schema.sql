@@ -1,5 +1,6 @@
 CREATE TABLE IF NOT EXISTS articles (
     id SERIAL PRIMARY KEY,
+    habr_id TEXT,
     url TEXT UNIQUE NOT NULL,
     title TEXT NOT NULL,
     text_content TEXT NOT NULL,
@@ -7,11 +8,27 @@ CREATE TABLE IF NOT EXISTS articles (
     views INTEGER DEFAULT 0,
     score INTEGER DEFAULT 0,
     comments_count INTEGER DEFAULT 0,
+    word_count INTEGER,
+    has_code SMALLINT,
+    has_images SMALLINT,
+    title_length INTEGER,
+    tags_count INTEGER,
     scraped_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_habr_id ON articles(habr_id);
 CREATE INDEX IF NOT EXISTS idx_articles_url ON articles(url);
 CREATE INDEX IF NOT EXISTS idx_articles_title ON articles(title);
 CREATE INDEX IF NOT EXISTS idx_articles_scraped_at ON articles(scraped_at);
 CREATE INDEX IF NOT EXISTS idx_articles_views ON articles(views);
 CREATE INDEX IF NOT EXISTS idx_articles_score ON articles(score);
+CREATE INDEX IF NOT EXISTS idx_articles_tags ON articles USING GIN (tags);
+CREATE INDEX IF NOT EXISTS idx_articles_views_score_id ON articles(views, score, id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS hub_stats AS
+SELECT tag AS hub, COUNT(*) AS articles_count
+FROM articles, unnest(tags) AS tag
+GROUP BY tag;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_hub_stats_hub ON hub_stats(hub);
+CREATE INDEX IF NOT EXISTS idx_hub_stats_articles_count ON hub_stats(articles_count DESC);
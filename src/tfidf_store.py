@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import shutil
+import pickle
+import logging
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TEXT_LENGTH = 500
+
+
+def document_text(title: Any, text_content: Any) -> str:
+
+    title = str(title) if title else ''
+    text_content = str(text_content)[:DOCUMENT_TEXT_LENGTH] if text_content else ''
+    return f"{title} {text_content}".strip()
+
+
+class TfidfDocumentStore:
+
+    def __init__(self, matrix: sparse.csr_matrix = None, doc_ids: List[str] = None):
+
+        self.matrix = matrix
+        self.doc_ids = [str(doc_id) for doc_id in doc_ids] if doc_ids is not None else []
+        self.row_index = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+    
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+    
+    def __contains__(self, doc_id) -> bool:
+        return str(doc_id) in self.row_index
+    
+    @classmethod
+    def build(cls, vectorizer, doc_ids: List[Any], texts: List[str]) -> 'TfidfDocumentStore':
+
+        matrix = normalize(vectorizer.transform(texts), norm='l2', copy=False).astype(np.float32).tocsr()
+        return cls(matrix, doc_ids)
+    
+    def upsert(self, vectorizer, doc_ids: List[Any], texts: List[str]) -> int:
+
+        if not doc_ids:
+            return 0
+        
+        new_store = TfidfDocumentStore.build(vectorizer, doc_ids, texts)
+        
+        if self.matrix is None or not self.doc_ids:
+            self.matrix, self.doc_ids, self.row_index = new_store.matrix, new_store.doc_ids, new_store.row_index
+            return len(new_store)
+        
+        replaced = set(new_store.doc_ids)
+        keep_rows = [row for row, doc_id in enumerate(self.doc_ids) if doc_id not in replaced]
+        
+        self.matrix = sparse.vstack([self.matrix[keep_rows], new_store.matrix], format='csr')
+        self.doc_ids = [self.doc_ids[row] for row in keep_rows] + new_store.doc_ids
+        self.row_index = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        return len(new_store)
+    
+    def similarities(self, query_vec: sparse.spmatrix, doc_ids: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+
+        rows = np.array([self.row_index.get(str(doc_id), -1) for doc_id in doc_ids], dtype=np.int64)
+        found = rows >= 0
+        scores = np.zeros(len(doc_ids), dtype=np.float64)
+        
+        if self.matrix is not None and found.any():
+            scores[found] = (self.matrix[rows[found]] @ query_vec.T).toarray().ravel()
+        
+        return scores, found
+    
+    def save(self, directory: str):
+
+        tmp_directory = f"{directory}.tmp"
+        old_directory = f"{directory}.old"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        
+        matrix = self.matrix.tocsr() if self.matrix is not None else sparse.csr_matrix((0, 0), dtype=np.float32)
+        np.save(os.path.join(tmp_directory, 'data.npy'), np.asarray(matrix.data, dtype=np.float32))
+        index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+        np.save(os.path.join(tmp_directory, 'indices.npy'), np.asarray(matrix.indices, dtype=index_dtype))
+        np.save(os.path.join(tmp_directory, 'indptr.npy'), np.asarray(matrix.indptr, dtype=index_dtype))
+        with open(os.path.join(tmp_directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'shape': list(matrix.shape), 'doc_ids': self.doc_ids}, f)
+        
+        shutil.rmtree(old_directory, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, old_directory)
+        os.replace(tmp_directory, directory)
+        shutil.rmtree(old_directory, ignore_errors=True)
+        
+        logger.info(f"TF-IDF матрица документов сохранена в {directory}: {matrix.shape}")
+    
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'TfidfDocumentStore':
+
+        mmap_mode = 'r' if mmap else None
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        
+        matrix = sparse.csr_matrix((
+            np.load(os.path.join(directory, 'data.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, 'indices.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, 'indptr.npy'), mmap_mode=mmap_mode)
+        ), shape=tuple(meta['shape']), copy=False)
+        
+        return cls(matrix, meta['doc_ids'])
+
+
+def load_vectorizer(tfidf_path: str):
+
+    with open(tfidf_path, 'rb') as f:
+        return pickle.load(f).get('vectorizer')
+
+
+def vectorize_articles(articles: List[Dict[str, Any]], data_dir: str, rebuild: bool = False) -> int:
+
+    tfidf_path = os.path.join(data_dir, 'tfidf_vectorizer.pkl')
+    store_dir = os.path.join(data_dir, 'tfidf_documents')
+    
+    if not os.path.exists(tfidf_path):
+        logger.warning(f"TF-IDF векторизатор не найден: {tfidf_path}, векторизация пропущена")
+        return 0
+    
+    articles = [article for article in articles if article.get('habr_id')]
+    if not articles:
+        return 0
+    
+    vectorizer = load_vectorizer(tfidf_path)
+    if rebuild or not os.path.exists(store_dir):
+        store = TfidfDocumentStore()
+    else:
+        store = TfidfDocumentStore.load(store_dir, mmap=False)
+    
+    count = store.upsert(
+        vectorizer,
+        [article['habr_id'] for article in articles],
+        [document_text(article.get('title'), article.get('text_content')) for article in articles]
+    )
+    store.save(store_dir)
+    
+    logger.info(f"Векторизовано {count} статей, всего в матрице {len(store)}")
+    return count
+
+
+def main():
+
+    from db_manager import DatabaseManager
+    
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else '../data'
+    
+    db_manager = DatabaseManager()
+    articles = [article for article in db_manager.get_articles_for_search() if article.get('habr_id')]
+    
+    if not articles:
+        logger.warning("Нет статей для векторизации")
+        return
+    
+    vectorize_articles(articles, data_dir, rebuild=True)
+
+
+if __name__ == "__main__":
+    main()
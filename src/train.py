@@ -14,6 +14,8 @@ from datetime import datetime
 import logging
 from typing import Tuple, List, Dict
 from db_manager import DatabaseManager
+from redis_manager import RedisManager
+from ranking_features import FEATURE_COLUMNS, feature_schema
 
 logging.basicConfig(
     level=logging.INFO,
@@ -36,23 +38,7 @@ class RankingModelTrainer:
             logger.warning(f"MLflow off")
             self.use_mlflow = False
         
-        self.feature_columns = [
-            'freshness',
-            'author_rating', 
-            'views',
-            'comments_count',
-            'article_word_count',
-            'has_code',
-            'has_images',
-            'title_length',
-            'tags_count',
-            
-            'tfidf_similarity',
-            'query_in_title',
-            'query_in_tags', 
-            'text_overlap_ratio',
-            'query_length'
-        ]
+        self.feature_columns = list(FEATURE_COLUMNS)
     
     def load_and_prepare_data(self, data_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
 
@@ -277,6 +263,7 @@ class RankingModelTrainer:
             
             feature_info = {
                 'feature_columns': self.feature_columns,
+                'feature_schema': feature_schema(),
                 'feature_importance': feature_importance,
                 'metrics': metrics,
                 'model_params': model.params
@@ -336,6 +323,9 @@ def main():
         logger.info("Обучение завершено")
         logger.info(f"Модель: {results['model_path']}")
         
+        # кэшированные ранжирования старой модели больше не нужны
+        RedisManager().bump_cache_generation()
+        
         logger.info("\nМетрики качества:")
         for metric, value in results['metrics'].items():
             logger.info(f"  {metric}: {value:.4f}")